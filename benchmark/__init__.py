@@ -0,0 +1,15 @@
+"""
+HeatMapCreator 性能测试: 合成大尺寸地图, 分阶段计时, 记录峰值内存, 并校验各实现的结果一致
+    python -m benchmark --sizes 200 1000 4000 --output result.json
+"""
+from .runner import CONFIGURATIONS, compare_results, run_case, verify_case
+from .synthetic import generate_occupancy_grid, synthetic_measurements
+
+__all__ = [
+    'CONFIGURATIONS',
+    'compare_results',
+    'generate_occupancy_grid',
+    'run_case',
+    'synthetic_measurements',
+    'verify_case',
+]
@@ -0,0 +1,95 @@
+import argparse
+import itertools
+import json
+import platform
+import sys
+import time
+
+import numpy as np
+
+from .runner import CONFIGURATIONS, STAGES, compare_results, run_case, verify_case
+from .synthetic import generate_occupancy_grid
+
+DEFAULT_CASES = [
+    (0.5, 0.16),  # HeatMapCreator的默认参数
+    # 0.05m/pixel时为 5px <= 5px: 已采用的测量点落在相邻格点的占地范围内(占地范围为 [-r, r-1]),
+    # 覆盖原始BFS把测量点当作障碍物、与其他实现结果不同的情况
+    (0.25, 0.25),
+]  # 未指定--interval和--radius时的 (测量间隔, 机器人半径) [m]
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m benchmark', description='HeatMapCreator 性能测试')
+    parser.add_argument('--sizes', type=int, nargs='+', default=[200, 1000, 2000, 4000, 8000], help='地图边长 [pixel]')
+    parser.add_argument('--interval', type=float, nargs='+', help='热力图的测量间隔 [m] (默认见DEFAULT_CASES, 只指定一方时另一方为0.5)')
+    parser.add_argument('--radius', type=float, nargs='+', help='机器人半径 [m] (默认见DEFAULT_CASES, 只指定一方时另一方为0.16)')
+    parser.add_argument('--resolution', type=float, default=0.05, help='地图的分辨率 [m/pixel]')
+    parser.add_argument('--configs', nargs='+', default=list(CONFIGURATIONS), choices=list(CONFIGURATIONS), help='参与测试的实现')
+    parser.add_argument('--reference-max-size', type=int, default=400, help='参考实现只在不超过该边长的地图上运行')
+    parser.add_argument('--repeat', type=int, default=3, help='重复次数(取最小值)')
+    parser.add_argument('--seed', type=int, default=0, help='合成地图的随机数种子')
+    parser.add_argument('--verify', action='store_true', help='检查各实现的结果与参考实现一致')
+    parser.add_argument('--output', help='保存结果的JSON文件')
+    parser.add_argument('--compare', help='与之前保存的JSON结果比较')
+    parser.add_argument('--threshold', type=float, default=0.2, help='判定为变慢的相对比例')
+    return parser.parse_args(argv)
+
+
+def main(argv=None) -> int:
+    args = parse_args(argv)
+    if args.interval is None and args.radius is None:
+        cases = DEFAULT_CASES
+    else:
+        cases = list(itertools.product(args.interval or [0.5], args.radius or [0.16]))
+    results = []
+    verification = []
+    for size in args.sizes:
+        frame = generate_occupancy_grid(size, resolution=args.resolution, seed=args.seed)
+        for interval, radius in cases:
+            configs = [
+                config for config in args.configs
+                if config != 'reference' or size <= args.reference_max_size
+            ]
+            for config in configs:
+                result = run_case(frame, config, interval, radius, args.repeat)
+                results.append(result)
+                stages = ' '.join(f'{stage}={result["times"][stage] * 1000:.1f}ms' for stage in STAGES)
+                peak = max(result['peak_memory'].values()) / 2 ** 20
+                print(f'{size}x{size} interval={interval} radius={radius} {config:<10} '
+                      f'points={result["points"]} {stages} peak={peak:.1f}MiB')
+            if args.verify and size <= args.reference_max_size:
+                for check in verify_case(frame, interval, radius, args.configs):
+                    verification.append(check)
+                    print(f'  verify {check["config"]}: {"OK" if check["passed"] else "FAILED"} '
+                          f'(missing={check["missing_points"]} extra={check["extra_points"]} '
+                          f'pixels={check["different_pixels"]})')
+
+    report = {
+        'meta': {
+            'time': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'python': platform.python_version(),
+            'numpy': np.__version__,
+            'platform': platform.platform(),
+            'argv': sys.argv[1:] if argv is None else list(argv),
+        },
+        'results': results,
+        'verification': verification,
+    }
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=1)
+
+    exit_code = 0
+    if args.compare:
+        with open(args.compare, 'r') as f:
+            baseline = json.load(f)['results']
+        for config, width, height, stage, previous, current in compare_results(results, baseline, args.threshold):
+            print(f'REGRESSION {config} {width}x{height} {stage}: {previous * 1000:.1f}ms -> {current * 1000:.1f}ms')
+            exit_code = 1
+    if not all(check['passed'] for check in verification):
+        exit_code = 1
+    return exit_code
+
+
+if __name__ == '__main__':
+    sys.exit(main())
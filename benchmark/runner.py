@@ -0,0 +1,153 @@
+import time
+import tracemalloc
+
+import numpy as np
+
+from src.HeatMapCreator import HeatMapCreator
+
+from .synthetic import synthetic_measurements
+
+CONFIGURATIONS = {
+    # 原始实现: 逐格复制、逐点BFS、逐对比较邻点
+    'reference': dict(ingest_mode='legacy', planner='bfs', neighbour_search='tolerance'),
+    # 零拷贝导入 + 可通行索引, 仍使用BFS
+    'clearance': dict(ingest_mode='view', use_clearance_index=True, planner='bfs', neighbour_search='lattice'),
+    # 全部向量化
+    'lattice': dict(ingest_mode='view', planner='lattice', neighbour_search='lattice'),
+}  # 参与测试的实现
+
+STAGES = ('ingest', 'explore', 'measure', 'render')  # 计时的阶段
+
+
+def _make_creator(config: str, heat_map_interval: float, robot_radius: float) -> HeatMapCreator:
+    creator = HeatMapCreator(heat_map_interval, **CONFIGURATIONS[config])
+    creator.robot_radius = robot_radius
+    return creator
+
+
+def _run_stages(creator: HeatMapCreator, frame, on_stage):
+    """
+    依次执行各阶段, 每个阶段结束后调用 on_stage(stage)
+    :return: 生成的热力图
+    """
+    creator.load_map(*frame[:6])
+    on_stage('ingest')
+    creator.explore_measurement_points()
+    on_stage('explore')
+    points_world = np.asarray(creator.available_measurement_points_world, dtype=np.float64).reshape(-1, 2)
+    creator.add_measurements(points_world, synthetic_measurements(points_world))
+    on_stage('measure')
+    img = creator.heatmap_callback()
+    on_stage('render')
+    return img
+
+
+def run_case(frame, config: str, heat_map_interval: float, robot_radius: float, repeat: int = 1) -> dict:
+    """
+    分阶段测量一种实现的耗时(取repeat次中的最小值)和峰值内存
+    :param frame: OccupancyGridFrame
+    :param config: CONFIGURATIONS 中的名称
+    :param heat_map_interval: 热力图的测量间隔 [m]
+    :param robot_radius: 机器人半径 [m]
+    :param repeat: 重复次数
+    :return: 结果字典
+    """
+    times = {stage: float('inf') for stage in STAGES}
+    creator = None
+    for _ in range(repeat):
+        creator = _make_creator(config, heat_map_interval, robot_radius)
+        last = [time.perf_counter()]
+
+        def on_stage(stage):
+            now = time.perf_counter()
+            times[stage] = min(times[stage], now - last[0])
+            last[0] = now
+
+        _run_stages(creator, frame, on_stage)
+
+    # 峰值内存单独测量一次, tracemalloc会拖慢纯Python的代码
+    peak_memory = {}
+    tracemalloc.start()
+    try:
+        def on_stage(stage):
+            peak_memory[stage] = tracemalloc.get_traced_memory()[1]
+            tracemalloc.reset_peak()
+
+        _run_stages(_make_creator(config, heat_map_interval, robot_radius), frame, on_stage)
+    finally:
+        tracemalloc.stop()
+
+    return {
+        'config': config,
+        'width': frame.width,
+        'height': frame.height,
+        'heat_map_interval': heat_map_interval,
+        'robot_radius': robot_radius,
+        'points': len(creator.available_measurement_points),
+        'times': times,
+        'total_time': sum(times.values()),
+        'peak_memory': peak_memory,
+    }
+
+
+def verify_case(frame, heat_map_interval: float, robot_radius: float, configs, reference: str = 'reference') -> list:
+    """
+    检查各实现得到的测量点和热力图是否与参考实现相同
+    :param frame: OccupancyGridFrame
+    :param heat_map_interval: 热力图的测量间隔 [m]
+    :param robot_radius: 机器人半径 [m]
+    :param configs: 要检查的实现
+    :param reference: 参考实现
+    :return: 每种实现一个结果字典
+    """
+    def run(config):
+        creator = _make_creator(config, heat_map_interval, robot_radius)
+        img = _run_stages(creator, frame, lambda stage: None)
+        points = np.asarray(creator.available_measurement_points, dtype=np.int64).reshape(-1, 2)
+        return {tuple(p) for p in points.tolist()}, img
+
+    reference_points, reference_img = run(reference)
+    results = []
+    for config in configs:
+        if config == reference:
+            continue
+        points, img = run(config)
+        different_pixels = int(np.count_nonzero((img != reference_img).any(axis=2)))
+        results.append({
+            'config': config,
+            'reference': reference,
+            'width': frame.width,
+            'height': frame.height,
+            'heat_map_interval': heat_map_interval,
+            'robot_radius': robot_radius,
+            'points_equal': points == reference_points,
+            'missing_points': len(reference_points - points),
+            'extra_points': len(points - reference_points),
+            'different_pixels': different_pixels,
+            'passed': points == reference_points and different_pixels == 0,
+        })
+    return results
+
+
+def compare_results(results: list, baseline: list, threshold: float = 0.2) -> list:
+    """
+    与之前保存的结果比较, 找出变慢超过threshold的阶段
+    :param results: 本次的 run_case 结果
+    :param baseline: 之前的 run_case 结果
+    :param threshold: 允许的相对变慢比例
+    :return: [(config, width, height, stage, baseline_time, time), ...]
+    """
+    def key(result):
+        return result['config'], result['width'], result['height'], result['heat_map_interval'], result['robot_radius']
+
+    baseline_by_key = {key(result): result for result in baseline}
+    regressions = []
+    for result in results:
+        previous = baseline_by_key.get(key(result))
+        if previous is None:
+            continue
+        for stage, seconds in result['times'].items():
+            previous_seconds = previous['times'].get(stage)
+            if previous_seconds and seconds > previous_seconds * (1 + threshold):
+                regressions.append((result['config'], result['width'], result['height'], stage, previous_seconds, seconds))
+    return regressions
@@ -0,0 +1,114 @@
+import numpy as np
+
+from src.map_loader import OccupancyGridFrame
+
+
+def generate_occupancy_grid(
+        width_pixel: int,
+        height_pixel: int = None,
+        resolution: float = 0.05,
+        room_size: float = 4.0,
+        wall_thickness: float = 0.1,
+        door_width: float = 1.0,
+        corridor_every: int = 3,
+        corridor_width: float = 2.0,
+        unknown_border: float = 1.0,
+        obstacle_density: float = 0.0005,
+        seed: int = 0,
+) -> OccupancyGridFrame:
+    """
+    生成合成的OccupancyGrid: 房间、门、走廊、零散障碍物, 外围为未知区域
+    世界坐标系原点位于地图中心附近的空闲格
+    :param width_pixel: 地图的宽度 [pixel]
+    :param height_pixel: 地图的高度 [pixel], None表示与宽度相同
+    :param resolution: 地图的分辨率 [m/pixel]
+    :param room_size: 房间边长 [m]
+    :param wall_thickness: 墙壁厚度 [m]
+    :param door_width: 门宽 [m]
+    :param corridor_every: 每隔多少个房间设置一条走廊(贯通, 没有墙壁)
+    :param corridor_width: 走廊宽度 [m]
+    :param unknown_border: 外围未知区域的宽度 [m]
+    :param obstacle_density: 零散障碍物的密度 (0~1)
+    :param seed: 随机数种子
+    :return: OccupancyGridFrame, data为ROS顺序(从地图最下方一行开始)的int8数组
+    """
+    if height_pixel is None:
+        height_pixel = width_pixel
+    rng = np.random.default_rng(seed)
+    room = max(int(room_size / resolution), 4)
+    wall = max(int(wall_thickness / resolution), 1)
+    door = max(int(door_width / resolution), 1)
+    corridor = int(corridor_width / resolution)
+    border = int(unknown_border / resolution)
+
+    grid = np.full((height_pixel, width_pixel), -1, dtype=np.int8)
+    interior = (slice(border, height_pixel - border), slice(border, width_pixel - border))
+    grid[interior] = 0
+
+    # 墙壁
+    wall_rows = (np.arange(height_pixel) - border) % room < wall
+    wall_cols = (np.arange(width_pixel) - border) % room < wall
+    walls = wall_rows[:, None] | wall_cols[None, :]
+    grid[interior][walls[interior]] = 100
+
+    # 每段墙壁上开一扇门
+    room_rows = range(border, height_pixel - border, room)
+    room_cols = range(border, width_pixel - border, room)
+    for y in room_rows:
+        for x in room_cols:
+            offset = rng.integers(wall, max(room - door, wall + 1))
+            grid[y:y + wall, x + offset:x + offset + door] = 0
+            offset = rng.integers(wall, max(room - door, wall + 1))
+            grid[y + offset:y + offset + door, x:x + wall] = 0
+
+    # 走廊
+    for i, y in enumerate(room_rows):
+        if i % corridor_every == corridor_every - 1:
+            grid[y - corridor // 2:y + corridor - corridor // 2, border:width_pixel - border] = 0
+    for i, x in enumerate(room_cols):
+        if i % corridor_every == corridor_every - 1:
+            grid[border:height_pixel - border, x - corridor // 2:x + corridor - corridor // 2] = 0
+
+    # 零散障碍物
+    scattered = rng.random((height_pixel, width_pixel)) < obstacle_density
+    grid[scattered & (grid == 0)] = 100
+
+    # 未知区域重新覆盖外围(墙壁和走廊不延伸到地图外)
+    grid[:border] = -1
+    grid[height_pixel - border:] = -1
+    grid[:, :border] = -1
+    grid[:, width_pixel - border:] = -1
+
+    # 原点: 中心附近的一个房间中心
+    center_y = border + (max(height_pixel - 2 * border, 1) // 2 // room) * room + room // 2
+    center_x = border + (max(width_pixel - 2 * border, 1) // 2 // room) * room + room // 2
+    center_y = min(center_y, height_pixel - 1)
+    center_x = min(center_x, width_pixel - 1)
+    grid[max(center_y - 1, 0):center_y + 2, max(center_x - 1, 0):center_x + 2] = 0
+
+    # 原点像素坐标为 int(origin / resolution), 加0.5避免浮点误差导致的截断
+    origin_x = -(center_x + 0.5) * resolution
+    origin_y = -(height_pixel - 1 - center_y + 0.5) * resolution
+    return OccupancyGridFrame(
+        grid[::-1].ravel(),
+        width_pixel,
+        height_pixel,
+        resolution,
+        origin_x,
+        origin_y,
+        0,
+        0,
+        'map'
+    )
+
+
+def synthetic_measurements(points_world) -> np.ndarray:
+    """
+    与点的顺序无关的平滑亮度场, 用于生成可复现的测量值
+    :param points_world: Nx2 的世界坐标 [m]
+    :return: N 个亮度 (0~1)
+    """
+    points_world = np.asarray(points_world, dtype=np.float64).reshape(-1, 2)
+    x = points_world[:, 0]
+    y = points_world[:, 1]
+    return 0.5 + 0.25 * np.sin(x * 0.7) * np.cos(y * 0.5) + 0.25 * np.sin((x + y) * 0.13)
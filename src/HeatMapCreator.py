@@ -1,26 +1,43 @@
+import time
+
 import numpy as np
 
+from .clearance import ClearanceIndex, changed_tiles
+from .colormap import get_colormap, value_to_color
+from .lattice import Lattice, cell_averages_at, node_cell_averages, select_measurement_points
+from .measurements import MeasurementGrid, brightness_range, lattice_key, normalize_brightness, snap_measurements
+from .profiling import NULL_PROFILER, StageProfiler
+from .rendering import RENDER_ENGINES, HeatmapCanvas, InterpolatedCanvas, StaticOverlay
+
+__all__ = [
+    'HeatMapCreator',
+    'occupancy_data_to_grid',
+    'value_to_color',  # 原来定义在本模块中, 保留导出
+]
+
 
-def value_to_color(val):
+def occupancy_data_to_grid(raw_grid_map_data, raw_grid_map_width_pixel: int, raw_grid_map_height_pixel: int):
     """
-    val: 0~1
-    return: [B,G,R] (0~255)
+    将/map的一维数据转换为上下翻转后的int8二维数组
+    array('b')、bytes等缓冲区对象不复制数据，直接reshape后返回翻转视图
+    :param raw_grid_map_data: 原始地图的数据 array('b') / bytes / list / np.ndarray
+    :param raw_grid_map_width_pixel: 原始地图的宽度 [pixel]
+    :param raw_grid_map_height_pixel: 原始地图的高度 [pixel]
+    :return: (height, width) 的只读int8数组, 第0行为地图最上方
     """
-    val = np.clip(val, 0.0, 1.0)
-    b, g, r = 0, 0, 0
-    if val <= 0.33:
-        b = 255 * ((0.33 - val) / 0.33)
-        g = 255 * (val / 0.33)
-        r = 0
-    elif 0.33 < val <= 0.66:
-        b = 0
-        g = 255
-        r = 255 * ((val - 0.33) / 0.33)
+    if isinstance(raw_grid_map_data, np.ndarray):
+        flat = raw_grid_map_data.reshape(-1).astype(np.int8, copy=False)
+    elif isinstance(raw_grid_map_data, (bytes, bytearray, memoryview)) or getattr(raw_grid_map_data, 'itemsize', 0) == 1:
+        flat = np.frombuffer(raw_grid_map_data, dtype=np.int8)
     else:
-        b = 0
-        g = 255 * ((1.0 - val) / 0.33)
-        r = 255
-    return [b, g, r]  # OpenCV/ROS 用 BGR 顺序
+        flat = np.asarray(raw_grid_map_data, dtype=np.int8)
+    if flat.size != raw_grid_map_width_pixel * raw_grid_map_height_pixel:
+        raise ValueError(
+            f'地图数据长度{flat.size}与尺寸{raw_grid_map_width_pixel}x{raw_grid_map_height_pixel}不符'
+        )
+    grid = flat.reshape(raw_grid_map_height_pixel, raw_grid_map_width_pixel)[::-1]
+    grid.flags.writeable = False  # 防止修改调用方(ROS消息)的数据
+    return grid
 
 
 class HeatMapCreator:
@@ -28,7 +45,57 @@ class HeatMapCreator:
     由ROS2发布的/map话题数据生成热力图
     """
 
-    def __init__(self, heat_map_interval: float):
+    def __init__(
+            self,
+            heat_map_interval: float,
+            ingest_mode: str = 'legacy',
+            use_clearance_index: bool = False,
+            planner: str = 'bfs',
+            connectivity: str = 'lattice',
+            neighbour_search: str = 'lattice',
+            colormap='blue_green_red',
+            incremental: bool = False,
+            profile_sink=None,
+            debug_level: int = 0,
+            render_engine: str = 'quadrant',
+    ):
+        """
+        :param heat_map_interval: 热力图的测量间隔 [m]
+        :param ingest_mode: 地图数据导入模式 'legacy': 逐格复制为int64数组 / 'view': int8零拷贝视图
+        :param use_clearance_index: 是否使用预先计算的可通行索引代替逐点扫描机器人占地范围
+                                    探索过程中不修改地图(测量点不视为障碍物), 结果与逐点扫描相同
+        :param planner: 测量点生成方式 'bfs': 逐点波前探索 / 'lattice': 整个格网批量计算(总是使用可通行索引)
+        :param connectivity: 'lattice'模式下的连通方式 'lattice': 与BFS相同 / 'free': 只保留经由可用格点与原点连通的点
+        :param neighbour_search: 热力图邻点查找方式 'lattice': 格网索引(整图批量着色) / 'tolerance': 逐对比较坐标(原始实现)
+                                 测量值在add_measurements中已吸附到格点, 'tolerance'的输入总是恰好位于格点上,
+                                 容差不再起作用, 只作为校验'lattice'结果的参考实现保留(O(N²))
+        :param colormap: 颜色映射 内置名称 / Colormap / BGR控制色列表
+        :param incremental: 增量模式，只重新计算与上一张地图相比有变化的区域(需要planner='lattice', ingest_mode='view')
+        :param profile_sink: 分阶段计时和计数的输出 InMemoryStats / logging.Logger / callback(kind, name, value), None表示不计时
+        :param debug_level: 调试输出 0: 不输出 1: 原点和测量点个数 2: 另外输出所有测量点坐标
+        :param render_engine: 热力图渲染引擎 'quadrant': 象限平均值填充格网单元 / 'bilinear': 双线性插值 / 'idw': 反距离加权插值
+                              插值引擎需要neighbour_search='lattice', 只在空闲区域着色
+        """
+        if ingest_mode not in ('legacy', 'view'):
+            raise ValueError(f'未知的地图数据导入模式: {ingest_mode}')
+        if planner not in ('bfs', 'lattice'):
+            raise ValueError(f'未知的测量点生成方式: {planner}')
+        if connectivity not in ('lattice', 'free'):
+            raise ValueError(f'未知的连通方式: {connectivity}')
+        if incremental and planner != 'lattice':
+            raise ValueError("增量模式需要planner='lattice'")
+        if incremental and ingest_mode != 'view':
+            # 'legacy'模式每条消息都逐格复制整张地图, 增量计算省下的时间被完全抵消
+            raise ValueError("增量模式需要ingest_mode='view'")
+        if neighbour_search not in ('lattice', 'tolerance'):
+            raise ValueError(f'未知的邻点查找方式: {neighbour_search}')
+        if render_engine not in RENDER_ENGINES:
+            raise ValueError(f'未知的热力图渲染引擎: {render_engine}')
+        if render_engine != 'quadrant' and neighbour_search != 'lattice':
+            raise ValueError("插值渲染引擎需要neighbour_search='lattice'")
+        self.ingest_mode = ingest_mode  # 地图数据导入模式
+        self.planner = planner  # 测量点生成方式
+        self.connectivity = connectivity  # 格网模式下的连通方式
         self.raw_grid_map_width_pixel = 0  # 原始地图的宽度 [pixel]
         self.raw_grid_map_height_pixel = 0  # 原始地图的高度 [pixel]
         self.raw_grid_map_width = 0  # 原始地图的宽度 [m]
@@ -40,7 +107,9 @@ class HeatMapCreator:
         self.raw_grid_map_origin_y = 0  # 原始地图原点y轴坐标 [m]
         self.raw_grid_map_origin_y_pixel = 0  # 原始地图原点y轴坐标 [pixel]
 
-        self.raw_grid_map_data_2d = []  # 原始地图的2D数据
+        self.raw_grid_map_data_2d = []  # 原始地图的2D数据 [0]: 地图 [1]: 访问标记
+        self.visited_mask = None  # 探索时的访问标记
+        self.measurement_point_mask = None  # 实际可用测量点的标记 (height, width) bool, 与导入模式无关
 
         self.heat_map_width_pixel = 0  # 热力图的宽度 [pixel]
         self.heat_map_height_pixel = 0  # 热力图的高度 [pixel]
@@ -50,12 +119,39 @@ class HeatMapCreator:
         self.heat_map_interval = heat_map_interval  # 热力图的测量间隔 [m]
         self.heat_map_interval_pixel = 0  # 热力图的测量间隔 [pixel]
         self.heat_map_data_2d = []  # 热力图的2D数据
+        self.neighbour_search = neighbour_search  # 热力图邻点查找方式
+        self.neighbour_tolerance_pixel = 3  # 邻点坐标匹配的容差 [pixel] (参考实现中保留, 输入已吸附到格点)
+        self.colormap = get_colormap(colormap)  # 颜色映射(查找表)
+        self.render_engine = render_engine  # 热力图渲染引擎
+        self.static_overlay = None  # 热力图的静态图层(网格线、障碍物、标记)
+        self.heatmap_canvas = None  # 缓存的热力图图像
+        self._heatmap_image = None  # heatmap_callback返回的图像(地图尺寸不变时换地图后继续写入同一个数组)
+        self.measurements = None  # 各测量点的测量值统计
+        self._brightness_min = None  # 热力图归一化使用的最小亮度
+        self._brightness_max = None  # 热力图归一化使用的最大亮度
 
         self.robot_radius = 0.16  # 机器人半径 [m]
         self.robot_radius_pixel = 0  # 机器人半径 [pixel]
 
-        self.available_measurement_points = []  # 实际可用测量点坐标 [pixel]
-        self.available_measurement_points_world = []  # 世界坐标系中实际可用测量点坐标 [m]
+        self.use_clearance_index = use_clearance_index  # 是否使用可通行索引
+        self.clearance_index = ClearanceIndex()  # 可通行索引(地图或机器人半径变化前重复使用)
+
+        self.lattice = None  # 测量点格网
+        self.available_measurement_points = []  # 实际可用测量点坐标 [pixel] ('lattice'模式下为Nx2数组)
+        self.available_measurement_points_world = []  # 世界坐标系中实际可用测量点坐标 [m] ('lattice'模式下为Nx2数组)
+        self._node_clearance = None  # 格点处的可通行性
+        self._lattice_available = None  # 格网上的可用格点
+
+        self.incremental = incremental  # 增量模式
+        self.incremental_tile_size = 64  # 增量模式下比较地图的分块大小 [pixel]
+        self._previous_grid = None  # 上一张地图(int8副本)
+        self._map_signature = None  # 上一张地图的尺寸、原点和参数
+        self.dirty_tile_count = 0  # 上一次地图更新中有变化的分块数
+        self.added_measurement_points = []  # 上一次地图更新中新增的测量点 [pixel]
+        self.removed_measurement_points = []  # 上一次地图更新中删除的测量点 [pixel]
+
+        self.profiler = NULL_PROFILER if profile_sink is None else StageProfiler(profile_sink)  # 分阶段计时
+        self.debug_level = debug_level  # 调试输出级别
 
     def map_callback(
             self,
@@ -76,6 +172,49 @@ class HeatMapCreator:
         :param raw_grid_map_origin_y: 原始地图原点y轴坐标 [m]
         :return:
         """
+        self.load_map(
+            raw_grid_map_data,
+            raw_grid_map_width_pixel,
+            raw_grid_map_height_pixel,
+            raw_grid_map_resolution,
+            raw_grid_map_origin_x,
+            raw_grid_map_origin_y
+        )
+        self.explore_measurement_points()
+
+    def load_map(
+            self,
+            raw_grid_map_data: list,
+            raw_grid_map_width_pixel: int,
+            raw_grid_map_height_pixel: int,
+            raw_grid_map_resolution: float,
+            raw_grid_map_origin_x: float,
+            raw_grid_map_origin_y: float,
+    ):
+        """
+        读入地图: 更新地图参数并将原始地图的数据转化为2D形式
+        参数同 map_callback
+        :return:
+        """
+        with self.profiler.stage('ingest'):
+            self._load_map(
+                raw_grid_map_data,
+                raw_grid_map_width_pixel,
+                raw_grid_map_height_pixel,
+                raw_grid_map_resolution,
+                raw_grid_map_origin_x,
+                raw_grid_map_origin_y
+            )
+
+    def _load_map(
+            self,
+            raw_grid_map_data: list,
+            raw_grid_map_width_pixel: int,
+            raw_grid_map_height_pixel: int,
+            raw_grid_map_resolution: float,
+            raw_grid_map_origin_x: float,
+            raw_grid_map_origin_y: float,
+    ):
         # 初始化
         self.raw_grid_map_data = raw_grid_map_data
         self.raw_grid_map_width_pixel = raw_grid_map_width_pixel
@@ -90,229 +229,478 @@ class HeatMapCreator:
 
         self.robot_radius_pixel = int(self.robot_radius / self.raw_grid_map_resolution)
 
-        # 创建空数组
-        self.raw_grid_map_data_2d = np.full((2, self.raw_grid_map_height_pixel, self.raw_grid_map_width_pixel), -1)
         # 将原始地图的数据转化为2D形式(完整变换，仅进行一次)
-        index = 0
-        for i in range(self.raw_grid_map_height_pixel):
-            for j in range(self.raw_grid_map_width_pixel):
-                self.raw_grid_map_data_2d[0][self.raw_grid_map_height_pixel - 1 - i][j] = self.raw_grid_map_data[index]
-                index += 1
+        with self.profiler.stage('flip'):
+            self._flip_map()
         # debug: 检查转换是否正确
         # print(f'原始地图2D数据:\n{self.raw_grid_map_data_2d}')
 
+    def _flip_map(self):
+        """
+        将原始地图的数据上下翻转为2D形式
+        :return:
+        """
+        raw_grid_map_data = self.raw_grid_map_data
+        if self.ingest_mode == 'view':
+            # 零拷贝: 第0层为int8只读视图，访问标记使用独立的bool平面
+            self.visited_mask = np.zeros((self.raw_grid_map_height_pixel, self.raw_grid_map_width_pixel), dtype=bool)
+            self.raw_grid_map_data_2d = [
+                occupancy_data_to_grid(raw_grid_map_data, self.raw_grid_map_width_pixel, self.raw_grid_map_height_pixel),
+                self.visited_mask
+            ]
+        else:
+            # 创建空数组
+            self.raw_grid_map_data_2d = np.full((2, self.raw_grid_map_height_pixel, self.raw_grid_map_width_pixel), -1)
+            index = 0
+            for i in range(self.raw_grid_map_height_pixel):
+                for j in range(self.raw_grid_map_width_pixel):
+                    self.raw_grid_map_data_2d[0][self.raw_grid_map_height_pixel - 1 - i][j] = self.raw_grid_map_data[index]
+                    index += 1
+            self.visited_mask = self.raw_grid_map_data_2d[1]
+
+    def explore_measurement_points(self):
+        """
+        在已读入的地图上计算可用测量点
+        :return:
+        """
+        with self.profiler.stage('explore'):
+            self._explore()
+        self.profiler.count('points_accepted', len(self.available_measurement_points))
+        if self.debug_level >= 1:
+            print(f'{len(self.available_measurement_points_world)}个测量点')
+        if self.debug_level >= 2:
+            print(self.available_measurement_points_world)
+
+    def _explore(self):
         # 像素坐标系中的世界坐标系原点的坐标
         true_origin_point = [
             -self.raw_grid_map_origin_x_pixel,
             self.raw_grid_map_height_pixel - 1 - -self.raw_grid_map_origin_y_pixel
         ]
-        # debug: 像素坐标系中的世界坐标系原点的坐标
-        print(f'像素坐标系中的世界坐标系原点的坐标: {true_origin_point}')
-
-        self.raw_grid_map_data_2d[1][true_origin_point[1]][true_origin_point[0]] = 1
+        if self.debug_level >= 1:
+            print(f'像素坐标系中的世界坐标系原点的坐标: {true_origin_point}')
+
+        map_signature = (
+            self.raw_grid_map_width_pixel,
+            self.raw_grid_map_height_pixel,
+            self.raw_grid_map_resolution,
+            true_origin_point[0],
+            true_origin_point[1],
+            self.heat_map_interval_pixel,
+            self.robot_radius_pixel
+        )
+        if self.incremental and self._previous_grid is not None and map_signature == self._map_signature:
+            # 增量模式: 尺寸、原点和参数都没有变化时只重新计算有变化的分块
+            self._update_incremental()
+        else:
+            self.static_overlay = None
+            self.heatmap_canvas = None
+            self._lattice_available = None
+            self.lattice = Lattice(
+                true_origin_point[0],
+                true_origin_point[1],
+                self.heat_map_interval_pixel,
+                self.raw_grid_map_width_pixel,
+                self.raw_grid_map_height_pixel
+            )
+            # 格网不变时保留已有的测量值
+            if self.measurements is None or self.measurements.key != lattice_key(self.lattice):
+                self.measurements = MeasurementGrid(self.lattice)
+            if self.incremental:
+                self._previous_grid = np.array(self.raw_grid_map_data_2d[0], dtype=np.int8)
+                self._map_signature = map_signature
+            if self.planner == 'lattice':
+                self._explore_lattice()
+            else:
+                self._explore_bfs(true_origin_point)
+
+    def _explore_bfs(self, true_origin_point: list):
+        """
+        从世界坐标系原点出发，以测量间隔逐点波前探索可用测量点
+        :param true_origin_point: 像素坐标系中的世界坐标系原点的坐标
+        :return:
+        """
+        grid = self.raw_grid_map_data_2d[0]
+        visited = self.raw_grid_map_data_2d[1]
+        visited[true_origin_point[1], true_origin_point[0]] = 1
+
+        profiling = self.profiler.enabled
+        footprint_time = [0.0]  # 占地范围检查的累计耗时 [s]
+        start = time.perf_counter()
+        if self.use_clearance_index:
+            # 每张地图只计算一次，之后每个候选点的判断为O(1)查表(地图外视为不可用)
+            self.clearance_index.query(grid, self.robot_radius_pixel)
+            is_point_available = self.clearance_index.is_clear
+        else:
+            is_point_available = self._is_point_available
+        footprint_time[0] += time.perf_counter() - start
+        if profiling:
+            # 只在计时时包装，不计时时没有额外开销
+            check_point = is_point_available
+
+            def is_point_available(x, y):
+                check_start = time.perf_counter()
+                try:
+                    return check_point(x, y)
+                finally:
+                    footprint_time[0] += time.perf_counter() - check_start
+        candidate_count = 0
 
         explore_origin_points = [true_origin_point]
         explore_results = []
 
-        self.available_measurement_points.clear()
-        self.available_measurement_points_world.clear()
+        self.available_measurement_points = []
+        self.available_measurement_points_world = []
 
+        # 上、下、左、右
+        directions = (
+            (0, -self.heat_map_interval_pixel),
+            (0, self.heat_map_interval_pixel),
+            (-self.heat_map_interval_pixel, 0),
+            (self.heat_map_interval_pixel, 0),
+        )
         while len(explore_origin_points) != 0:
             for i in explore_origin_points:
-                # 上
-                new_x = i[0]
-                new_y = i[1] - self.heat_map_interval_pixel
-                if (
-                        0
-                        <= new_y
-                        <= self.raw_grid_map_height_pixel - 1
-                        and self.raw_grid_map_data_2d[1][new_y][new_x] != 1
-                ):
-                    explore_results.append([new_x, new_y])
-                    self.raw_grid_map_data_2d[1][new_y][new_x] = 1
-                    is_point_available = True
-                    if not self.raw_grid_map_data_2d[0][new_y][new_x] == 0:
-                        is_point_available = False
-                    else:
-                        for y in range(self.robot_radius_pixel * 2):
-                            for x in range(self.robot_radius_pixel * 2):
-                                if ((-self.robot_radius_pixel + x) ** 2 + (-self.robot_radius_pixel + y) ** 2) ** 0.5 <= self.robot_radius_pixel:
-                                    if self.raw_grid_map_data_2d[0][new_y - self.robot_radius_pixel + y][new_x - self.robot_radius_pixel + x] != 0:
-                                        is_point_available = False
-                    if is_point_available:
-                        self.available_measurement_points.append([new_x, new_y])
-                        self.raw_grid_map_data_2d[0][new_y][new_x] = 1
-
-                # 下
-                new_x = i[0]
-                new_y = i[1] + self.heat_map_interval_pixel
-                if (
-                        0
-                        <= new_y
-                        <= self.raw_grid_map_height_pixel - 1
-                        and self.raw_grid_map_data_2d[1][new_y][new_x] != 1
-                ):
+                for dx, dy in directions:
+                    new_x = i[0] + dx
+                    new_y = i[1] + dy
+                    if not (
+                            0 <= new_x <= self.raw_grid_map_width_pixel - 1
+                            and 0 <= new_y <= self.raw_grid_map_height_pixel - 1
+                    ) or visited[new_y, new_x] == 1:
+                        continue
                     explore_results.append([new_x, new_y])
-                    self.raw_grid_map_data_2d[1][new_y][new_x] = 1
-                    is_point_available = True
-                    if not self.raw_grid_map_data_2d[0][new_y][new_x] == 0:
-                        is_point_available = False
-                    else:
-                        for y in range(self.robot_radius_pixel * 2):
-                            for x in range(self.robot_radius_pixel * 2):
-                                if ((-self.robot_radius_pixel + x) ** 2 + (-self.robot_radius_pixel + y) ** 2) ** 0.5 <= self.robot_radius_pixel:
-                                    if self.raw_grid_map_data_2d[0][new_y - self.robot_radius_pixel + y][new_x - self.robot_radius_pixel + x] != 0:
-                                        is_point_available = False
-                    if is_point_available:
+                    visited[new_y, new_x] = 1
+                    if is_point_available(new_x, new_y):
                         self.available_measurement_points.append([new_x, new_y])
-                        self.raw_grid_map_data_2d[0][new_y][new_x] = 1
-
-                # 左
-                new_x = i[0] - self.heat_map_interval_pixel
-                new_y = i[1]
-                if (
-                        0
-                        <= new_x
-                        <= self.raw_grid_map_width_pixel - 1
-                        and self.raw_grid_map_data_2d[1][new_y][new_x] != 1
-                ):
-                    explore_results.append([new_x, new_y])
-                    self.raw_grid_map_data_2d[1][new_y][new_x] = 1
-                    is_point_available = True
-                    if not self.raw_grid_map_data_2d[0][new_y][new_x] == 0:
-                        is_point_available = False
-                    else:
-                        for y in range(self.robot_radius_pixel * 2):
-                            for x in range(self.robot_radius_pixel * 2):
-                                if ((-self.robot_radius_pixel + x) ** 2 + (-self.robot_radius_pixel + y) ** 2) ** 0.5 <= self.robot_radius_pixel:
-                                    if self.raw_grid_map_data_2d[0][new_y - self.robot_radius_pixel + y][new_x - self.robot_radius_pixel + x] != 0:
-                                        is_point_available = False
-                    if is_point_available:
-                        self.available_measurement_points.append([new_x, new_y])
-                        self.raw_grid_map_data_2d[0][new_y][new_x] = 1
-
-                # 右
-                new_x = i[0] + self.heat_map_interval_pixel
-                new_y = i[1]
-                if (
-                        0
-                        <= new_x
-                        <= self.raw_grid_map_width_pixel - 1
-                        and self.raw_grid_map_data_2d[1][new_y][new_x] != 1
-                ):
-                    explore_results.append([new_x, new_y])
-                    self.raw_grid_map_data_2d[1][new_y][new_x] = 1
-                    is_point_available = True
-                    if not self.raw_grid_map_data_2d[0][new_y][new_x] == 0:
-                        is_point_available = False
-                    else:
-                        for y in range(self.robot_radius_pixel * 2):
-                            for x in range(self.robot_radius_pixel * 2):
-                                if ((-self.robot_radius_pixel + x) ** 2 + (-self.robot_radius_pixel + y) ** 2) ** 0.5 <= self.robot_radius_pixel:
-                                    if self.raw_grid_map_data_2d[0][new_y - self.robot_radius_pixel + y][new_x - self.robot_radius_pixel + x] != 0:
-                                        is_point_available = False
-                    if is_point_available:
-                        self.available_measurement_points.append([new_x, new_y])
-                        self.raw_grid_map_data_2d[0][new_y][new_x] = 1
 
+            candidate_count += len(explore_results)
             explore_origin_points = explore_results
             explore_results = []
-        for n in self.available_measurement_points:
-            self.available_measurement_points_world.append([
-                (n[0] - true_origin_point[0]) * self.raw_grid_map_resolution,
-                -(n[1] - true_origin_point[1]) * self.raw_grid_map_resolution
-            ])
-        print(f'{len(self.available_measurement_points_world)}个测量点\n{self.available_measurement_points_world}')
+        # 探索结束后再标记: 已接受的测量点不是障碍物，不影响其他候选点的判断
+        self._stamp_measurement_points()
+        self.profiler.record_time('footprint_check', footprint_time[0])
+        self.profiler.count('candidates_visited', candidate_count)
+        with self.profiler.stage('world_conversion'):
+            for n in self.available_measurement_points:
+                self.available_measurement_points_world.append([
+                    (n[0] - true_origin_point[0]) * self.raw_grid_map_resolution,
+                    -(n[1] - true_origin_point[1]) * self.raw_grid_map_resolution
+                ])
+
+        points = np.asarray(self.available_measurement_points, dtype=np.int64).reshape(-1, 2)
+        rows, cols, valid = self.lattice.node_index(points[:, 0], points[:, 1])
+        self._lattice_available = np.zeros(self.lattice.shape, dtype=bool)
+        self._lattice_available[rows[valid], cols[valid]] = True
+
+    def _explore_lattice(self):
+        """
+        在整个测量点格网上批量计算可用测量点
+        :return:
+        """
+        with self.profiler.stage('footprint_check'):
+            clearance_map = self.clearance_index.query(self.raw_grid_map_data_2d[0], self.robot_radius_pixel)
+            self._node_clearance = clearance_map[np.ix_(self.lattice.ys, self.lattice.xs)]
+        self.profiler.count('candidates_visited', self._node_clearance.size - int(self.lattice.contains_origin()))
+        self._set_lattice_points(select_measurement_points(self.lattice, self._node_clearance, self.connectivity))
+
+    def _update_incremental(self):
+        """
+        与上一张地图比较，只在有变化的分块(及机器人半径范围)内重新计算可通行性和测量点
+        地图没有变化时不做任何计算
+        :return:
+        """
+        grid = self.raw_grid_map_data_2d[0]
+        tiles = changed_tiles(self._previous_grid, grid, self.incremental_tile_size)
+        self.dirty_tile_count = int(np.count_nonzero(tiles))
+        if self.dirty_tile_count == 0:
+            self.added_measurement_points = np.empty((0, 2), dtype=np.int64)
+            self.removed_measurement_points = np.empty((0, 2), dtype=np.int64)
+            self._stamp_lattice_points()
+            return
+
+        self._previous_grid = np.array(grid, dtype=np.int8)
+        self.static_overlay = None
+        self.heatmap_canvas = None
+        with self.profiler.stage('footprint_check'):
+            regions = self.clearance_index.update_tiles(grid, tiles, self.incremental_tile_size)
+            candidate_count = 0
+            for y0, y1, x0, x1 in regions:
+                rows = np.flatnonzero((y0 <= self.lattice.ys) & (self.lattice.ys < y1))
+                cols = np.flatnonzero((x0 <= self.lattice.xs) & (self.lattice.xs < x1))
+                self._node_clearance[np.ix_(rows, cols)] = self.clearance_index.clearance_map[
+                    np.ix_(self.lattice.ys[rows], self.lattice.xs[cols])
+                ]
+                candidate_count += rows.size * cols.size
+        self.profiler.count('candidates_visited', candidate_count)
+        self._set_lattice_points(select_measurement_points(self.lattice, self._node_clearance, self.connectivity))
+
+    def _set_lattice_points(self, available: np.ndarray):
+        """
+        由格网上的可用格点更新测量点坐标，并记录与上一次相比新增和删除的测量点
+        :param available: 格网上可用格点的 (ny, nx) bool数组
+        :return:
+        """
+        previous = self._lattice_available
+        if previous is None or previous.shape != available.shape:
+            previous = np.zeros_like(available)
+        self.added_measurement_points = self.lattice.node_pixels(*np.nonzero(available & ~previous))
+        self.removed_measurement_points = self.lattice.node_pixels(*np.nonzero(previous & ~available))
+        self._lattice_available = available
+
+        rows, cols = np.nonzero(available)
+        points = self.lattice.node_pixels(rows, cols)
+        self.available_measurement_points = points
+        with self.profiler.stage('world_conversion'):
+            self.available_measurement_points_world = self.lattice.pixels_to_world(points, self.raw_grid_map_resolution)
+        self._stamp_lattice_points()
+
+    def _stamp_lattice_points(self):
+        """
+        在raw_grid_map_data_2d中标记已访问格点和测量点(与BFS的结果一致)
+        :return:
+        """
+        self.raw_grid_map_data_2d[1][np.ix_(self.lattice.ys, self.lattice.xs)] = 1
+        self._stamp_measurement_points()
+
+    def _stamp_measurement_points(self):
+        """
+        在measurement_point_mask中标记测量点
+        'legacy'模式下同时在raw_grid_map_data_2d[0]中标记为1('view'模式的地图为只读视图)
+        :return:
+        """
+        points = np.asarray(self.available_measurement_points, dtype=np.int64).reshape(-1, 2)
+        shape = (self.raw_grid_map_height_pixel, self.raw_grid_map_width_pixel)
+        if self.measurement_point_mask is None or self.measurement_point_mask.shape != shape:
+            self.measurement_point_mask = np.zeros(shape, dtype=bool)
+        else:
+            self.measurement_point_mask[:] = False
+        self.measurement_point_mask[points[:, 1], points[:, 0]] = True
+        if self.ingest_mode == 'legacy':
+            self.raw_grid_map_data_2d[0][points[:, 1], points[:, 0]] = 1
+
+    def _is_point_available(self, x: int, y: int) -> bool:
+        """
+        逐格检查(x, y)及以其为中心的机器人圆形占地范围内是否全部为空闲
+        :param x: 像素坐标x
+        :param y: 像素坐标y
+        :return: 是否可用
+        """
+        grid = self.raw_grid_map_data_2d[0]
+        if grid[y, x] != 0:
+            return False
+        for dy in range(self.robot_radius_pixel * 2):
+            for dx in range(self.robot_radius_pixel * 2):
+                if ((-self.robot_radius_pixel + dx) ** 2 + (-self.robot_radius_pixel + dy) ** 2) ** 0.5 <= self.robot_radius_pixel:
+                    if grid[y - self.robot_radius_pixel + dy, x - self.robot_radius_pixel + dx] != 0:
+                        return False
+        return True
+
+    def _search_quadrant_brightness(self, i: list, measurement_points: list) -> list:
+        """
+        遍历所有测量点, 按±neighbour_tolerance_pixel的容差查找邻点并计算四个象限的平均亮度 O(N)
+        参考实现: 测量点来自格点坐标, 容差匹配等价于精确匹配
+        :param i: 测量点 [x, y, 平均亮度]
+        :param measurement_points: 所有测量点
+        :return: [象限1, 象限2, 象限3, 象限4] 的平均亮度
+        """
+        t = self.neighbour_tolerance_pixel
+        brightness_1 = [i[2]]
+        brightness_2 = [i[2]]
+        brightness_3 = [i[2]]
+        brightness_4 = [i[2]]
+        for j in measurement_points:
+            if i[0] + self.heat_map_interval_pixel - t <= j[0] <= i[0] + self.heat_map_interval_pixel + t and i[1] - t <= j[1] <= i[1] + t:
+                brightness_1.append(j[2])
+                brightness_4.append(j[2])
+            elif i[0] + self.heat_map_interval_pixel - t <= j[0] <= i[0] + self.heat_map_interval_pixel + t and i[1] - self.heat_map_interval_pixel - t <= j[1] <= i[1] - self.heat_map_interval_pixel + t:
+                brightness_1.append(j[2])
+            elif i[0] - t <= j[0] <= i[0] + t and i[1] - self.heat_map_interval_pixel - t <= j[1] <= i[1] - self.heat_map_interval_pixel + t:
+                brightness_1.append(j[2])
+                brightness_2.append(j[2])
+            elif i[0] - self.heat_map_interval_pixel - t <= j[0] <= i[0] - self.heat_map_interval_pixel + t and i[1] - self.heat_map_interval_pixel - t <= j[1] <= i[1] - self.heat_map_interval_pixel + t:
+                brightness_2.append(j[2])
+            elif i[0] - self.heat_map_interval_pixel - t <= j[0] <= i[0] - self.heat_map_interval_pixel + t and i[1] - t <= j[1] <= i[1] + t:
+                brightness_2.append(j[2])
+                brightness_3.append(j[2])
+            elif i[0] - self.heat_map_interval_pixel - t <= j[0] <= i[0] - self.heat_map_interval_pixel + t and i[1] + self.heat_map_interval_pixel - t <= j[1] <= i[1] + self.heat_map_interval_pixel + t:
+                brightness_3.append(j[2])
+            elif i[0] - t <= j[0] <= i[0] + t and i[1] + self.heat_map_interval_pixel - t <= j[1] <= i[1] + self.heat_map_interval_pixel + t:
+                brightness_3.append(j[2])
+                brightness_4.append(j[2])
+            elif i[0] + self.heat_map_interval_pixel - t <= j[0] <= i[0] + self.heat_map_interval_pixel + t and i[1] + self.heat_map_interval_pixel - t <= j[1] <= i[1] + self.heat_map_interval_pixel + t:
+                brightness_4.append(j[2])
+        return [
+            sum(brightness_1) / len(brightness_1),
+            sum(brightness_2) / len(brightness_2),
+            sum(brightness_3) / len(brightness_3),
+            sum(brightness_4) / len(brightness_4)
+        ]
+
+    def add_measurements(self, points, values) -> int:
+        """
+        添加一批测量值，吸附到最近的格点并累计统计(个数、总和、最小值、最大值)
+        已经生成过热力图('lattice'模式)时只重绘受影响的格网单元，归一化范围变化时重绘整张图
+        :param points: Nx2 的世界坐标 [m]
+        :param values: N 个测量值
+        :return: 被采用的测量值个数(最近的格点不是可用测量点的测量值被丢弃)
+        """
+        with self.profiler.stage('measure'):
+            return self._add_measurements(points, values)
+
+    def _add_measurements(self, points, values) -> int:
+        rows, cols, values = snap_measurements(
+            self.lattice,
+            self._lattice_available,
+            self.raw_grid_map_resolution,
+            points,
+            values
+        )
+        if rows.size == 0:
+            return 0
+
+        previous_brightness = self.measurements.mean[rows, cols]
+        updated = self.measurements.add(rows, cols, values)
+        if self.heatmap_canvas is not None and self.heatmap_canvas.image is not None:
+            self._refresh_heatmap(previous_brightness, updated)
+        return int(rows.size)
+
+    def _refresh_heatmap(self, previous_brightness: np.ndarray, updated: tuple):
+        """
+        测量值更新后重绘缓存的热力图
+        归一化范围不变时只重绘更新的格点周围的格网单元
+        :param previous_brightness: 更新前被更新格点的平均亮度
+        :param updated: 被更新的格点 (rows, cols)
+        :return:
+        """
+        if self.render_engine != 'quadrant':
+            # 插值结果与周围多个格点有关, 整图重新插值(耗时与像素数成正比)
+            self.heatmap_callback()
+            return
+
+        brightness = self.measurements.mean[updated]
+        if (
+                np.any(previous_brightness == self._brightness_min)
+                or np.any(previous_brightness == self._brightness_max)
+        ):
+            # 原来的最小/最大值可能已经不存在，重新统计
+            brightness_min, brightness_max = brightness_range(self._node_brightness())
+        else:
+            brightness_min = min(self._brightness_min, brightness.min())
+            brightness_max = max(self._brightness_max, brightness.max())
+        if brightness_min != self._brightness_min or brightness_max != self._brightness_max:
+            self.heatmap_callback()
+            return
+
+        # 每个格点是其右下、左下、右上、左上四个格网单元的一个角
+        cells = np.unique(np.ravel_multi_index(
+            (
+                np.concatenate([updated[0], updated[0], updated[0] + 1, updated[0] + 1]),
+                np.concatenate([updated[1], updated[1] + 1, updated[1], updated[1] + 1])
+            ),
+            (self.lattice.shape[0] + 1, self.lattice.shape[1] + 1)
+        ))
+        cell_rows, cell_cols = np.unravel_index(cells, (self.lattice.shape[0] + 1, self.lattice.shape[1] + 1))
+        cell_values = cell_averages_at(self.measurements.mean, cell_rows, cell_cols, self._lattice_available)
+        self.heatmap_canvas.update_cells(
+            cell_rows,
+            cell_cols,
+            normalize_brightness(cell_values, self._brightness_min, self._brightness_max)
+        )
+
+    def _node_brightness(self) -> np.ndarray:
+        """
+        :return: (ny, nx) 的各测量点平均亮度，没有测量值或不是可用测量点的格点为NaN
+        """
+        return self.measurements.brightness(self._lattice_available)
 
     def heatmap_callback(self):
         """
         生成亮度热力图
+        'lattice'模式下返回缓存的图像，之后的add_measurements(包括归一化范围变化和插值引擎的整图重绘)
+        以及地图尺寸不变时的下一次heatmap_callback都直接写入这张图像
         :return:
         """
+        with self.profiler.stage('heatmap'):
+            return self._render_heatmap()
+
+    def _render_heatmap(self):
+        node_brightness = self._node_brightness()
+        self._brightness_min, self._brightness_max = brightness_range(node_brightness)
+
+        # 网格线、障碍物、原点和测量点坐标(每张地图只计算一次)
+        if self.static_overlay is None:
+            with self.profiler.stage('overlay'):
+                self.static_overlay = StaticOverlay(
+                    self.lattice,
+                    self.raw_grid_map_data_2d[0],
+                    np.asarray(self.available_measurement_points).reshape(-1, 2)
+                )
+
+        # 生成热力图
+        if self.render_engine != 'quadrant':
+            # 在格网分辨率上插值后一次放大到像素, 障碍物和未知区域不着色
+            if self.heatmap_canvas is None:
+                grid = self.raw_grid_map_data_2d[0]
+                self.heatmap_canvas = InterpolatedCanvas(
+                    self.lattice,
+                    self.static_overlay,
+                    self.colormap,
+                    self.render_engine,
+                    (grid == 0) | (grid == 1),  # 'legacy'模式下测量点被标记为1
+                    profiler=self.profiler,
+                    image=self._heatmap_image
+                )
+            self._heatmap_image = self.heatmap_canvas.render(
+                normalize_brightness(node_brightness, self._brightness_min, self._brightness_max)
+            )
+            return self._heatmap_image
+
+        if self.neighbour_search == 'lattice':
+            # 每个格网单元的值为四个角上测量点的平均值(即各测量点的象限平均值)，整图一次着色
+            cell_values = normalize_brightness(
+                node_cell_averages(node_brightness),
+                self._brightness_min,
+                self._brightness_max
+            )
+            if self.heatmap_canvas is None:
+                self.heatmap_canvas = HeatmapCanvas(
+                    self.lattice,
+                    self.static_overlay,
+                    self.colormap,
+                    self.raw_grid_map_height_pixel,
+                    self.raw_grid_map_width_pixel,
+                    profiler=self.profiler,
+                    image=self._heatmap_image
+                )
+            self._heatmap_image = self.heatmap_canvas.render(cell_values)
+            return self._heatmap_image
+
+        # 参考实现: 逐点容差匹配, 测量点为吸附后的格点坐标
+        rows, cols = np.nonzero(~np.isnan(node_brightness))
+        measurement_points = np.concatenate([
+            self.lattice.node_pixels(rows, cols),
+            node_brightness[rows, cols][:, None]
+        ], axis=1).tolist()
+        for i in measurement_points:
+            i[0] = int(i[0])
+            i[1] = int(i[1])
+
+        fill_start = time.perf_counter()
         img = np.ones(
             (self.raw_grid_map_height_pixel, self.raw_grid_map_width_pixel, 3),
             dtype=np.uint8
         ) * 150
-
-        # debug:创造假亮度数据
-        for i in self.available_measurement_points:
-            i.append(np.random.randint(0, 100) * 0.01)
-
-        brightness = []
-        for i in self.available_measurement_points:
-            brightness.append(i[2])
-
-        # 生成热力图
-        # origin_x = -self.raw_grid_map_origin_x_pixel
-        # origin_y = self.raw_grid_map_height_pixel - 1 - -self.raw_grid_map_origin_y_pixel
-        # img[origin_y + 1:origin_y + self.heat_map_interval_pixel, origin_x + 1:origin_x + self.heat_map_interval_pixel] = value_to_color(0.9)
-
-        for i in self.available_measurement_points:
-            brightness_1 = [i[2]]
-            brightness_2 = [i[2]]
-            brightness_3 = [i[2]]
-            brightness_4 = [i[2]]
-            for j in self.available_measurement_points:
-                if i[0] + self.heat_map_interval_pixel - 3 <= j[0] <= i[0] + self.heat_map_interval_pixel + 3 and i[1] - 3 <= j[0] <= i[1] + 3:
-                    brightness_1.append(j[2])
-                    brightness_4.append(j[2])
-                elif i[0] + self.heat_map_interval_pixel - 3 <= j[0] <= i[0] + self.heat_map_interval_pixel + 3 and i[1] - self.heat_map_interval_pixel - 3 <= j[1] <= i[1] - self.heat_map_interval_pixel + 3:
-                    brightness_1.append(j[2])
-                elif i[0] - 3 <= j[0] <= i[0] + 3 and i[1] - self.heat_map_interval_pixel - 3 <= j[0] <= i[1] - self.heat_map_interval_pixel + 3:
-                    brightness_1.append(j[2])
-                    brightness_2.append(j[2])
-                elif i[0] - self.heat_map_interval_pixel - 3 <= j[0] <= i[0] - self.heat_map_interval_pixel + 3 and i[1] - self.heat_map_interval_pixel - 3 <= j[1] <= i[1] - self.heat_map_interval_pixel + 3:
-                    brightness_2.append(j[2])
-                elif i[0] - self.heat_map_interval_pixel - 3 <= j[0] <= i[0] - self.heat_map_interval_pixel + 3 and i[1] - 3 <= j[1] <= i[1] + 3:
-                    brightness_2.append(j[2])
-                    brightness_3.append(j[2])
-                elif i[0] - self.heat_map_interval_pixel - 3 <= j[0] <= i[0] - self.heat_map_interval_pixel + 3 and i[1] + self.heat_map_interval_pixel - 3 <= j[1] <= i[1] + self.heat_map_interval_pixel + 3:
-                    brightness_3.append(j[2])
-                elif i[0] - 3 <= j[0] <= i[0] + 3 and i[1] + self.heat_map_interval_pixel - 3 <= j[0] <= i[1] + self.heat_map_interval_pixel + 3:
-                    brightness_3.append(j[2])
-                    brightness_4.append(j[2])
-                elif i[0] + self.heat_map_interval_pixel - 3 <= j[0] <= i[0] + self.heat_map_interval_pixel + 3 and i[1] + self.heat_map_interval_pixel - 3 <= j[1] <= i[1] + self.heat_map_interval_pixel + 3:
-                    brightness_4.append(j[2])
-            value_1 = ((sum(brightness_1) / len(brightness_1)) - min(brightness))/(max(brightness) - min(brightness))
-            img[i[1] - self.heat_map_interval_pixel:i[1], i[0] + 1:i[0] + self.heat_map_interval_pixel] = value_to_color(value_1)
-            value_2 = ((sum(brightness_2) / len(brightness_2)) - min(brightness)) / (max(brightness) - min(brightness))
-            img[i[1] - self.heat_map_interval_pixel:i[1], i[0] - self.heat_map_interval_pixel:i[0]] = value_to_color(value_2)
-            value_3 = ((sum(brightness_3) / len(brightness_3)) - min(brightness)) / (max(brightness) - min(brightness))
-            img[i[1] + 1:i[1] + self.heat_map_interval_pixel, i[0] - self.heat_map_interval_pixel:i[0]] = value_to_color(value_3)
-            value_4 = ((sum(brightness_4) / len(brightness_4)) - min(brightness)) / (max(brightness) - min(brightness))
-            img[i[1] + 1:i[1] + self.heat_map_interval_pixel, i[0] + 1:i[0] + self.heat_map_interval_pixel] = value_to_color(value_4)
-
-        # 生成网格线
-        for y_positive in range(int((self.raw_grid_map_height_pixel - 1 - -self.raw_grid_map_origin_y_pixel) / self.heat_map_interval_pixel) + 1):
-            y = int(self.raw_grid_map_height_pixel - 1 - -self.raw_grid_map_origin_y_pixel - y_positive * self.heat_map_interval_pixel)
-            img[y, :] = [50, 50, 50]
-
-        for y_negative in range(int((self.raw_grid_map_height_pixel - (self.raw_grid_map_height_pixel - 1 - -self.raw_grid_map_origin_y_pixel)) / self.heat_map_interval_pixel) + 1):
-            y = int(self.raw_grid_map_height_pixel - 1 - -self.raw_grid_map_origin_y_pixel + y_negative * self.heat_map_interval_pixel)
-            img[y, :] = [50, 50, 50]
-
-        for x_positive in range(int((self.raw_grid_map_width_pixel - -self.raw_grid_map_origin_x_pixel) / self.heat_map_interval_pixel) + 1):
-            x = int(-self.raw_grid_map_origin_x_pixel + x_positive * self.heat_map_interval_pixel)
-            img[:, x] = [50, 50, 50]
-
-        for x_negative in range(int(-self.raw_grid_map_origin_x_pixel / self.heat_map_interval_pixel) + 1):
-            x = int(-self.raw_grid_map_origin_x_pixel - x_negative * self.heat_map_interval_pixel)
-            img[:, x] = [50, 50, 50]
-
-        index = 0
-        for i in range(self.raw_grid_map_height_pixel):
-            for j in range(self.raw_grid_map_width_pixel):
-                if self.raw_grid_map_data_2d[0][self.raw_grid_map_height_pixel - 1 - i][j] > 1:
-                    img[-i, j] = [0, 0, 0]
-                index += 1
-
-        # 生成原点坐标
-        origin_x = -self.raw_grid_map_origin_x_pixel
-        origin_y = self.raw_grid_map_height_pixel - 1 - -self.raw_grid_map_origin_y_pixel
-        img[origin_y - 1:origin_y + 2, origin_x - 1:origin_x + 2] = [0, 0, 255]
-
-        # 生成测量点坐标
-        for i in self.available_measurement_points:
-            img[i[1] - 1:i[1] + 2, i[0] - 1:i[0] + 2] = [255, 0, 0]
-        return img
-
+        for i in measurement_points:
+            average_1, average_2, average_3, average_4 = self._search_quadrant_brightness(i, measurement_points)
+            value_1 = normalize_brightness(average_1, self._brightness_min, self._brightness_max)
+            img[i[1] - self.heat_map_interval_pixel:i[1], i[0] + 1:i[0] + self.heat_map_interval_pixel] = self.colormap(value_1)
+            value_2 = normalize_brightness(average_2, self._brightness_min, self._brightness_max)
+            img[i[1] - self.heat_map_interval_pixel:i[1], i[0] - self.heat_map_interval_pixel:i[0]] = self.colormap(value_2)
+            value_3 = normalize_brightness(average_3, self._brightness_min, self._brightness_max)
+            img[i[1] + 1:i[1] + self.heat_map_interval_pixel, i[0] - self.heat_map_interval_pixel:i[0]] = self.colormap(value_3)
+            value_4 = normalize_brightness(average_4, self._brightness_min, self._brightness_max)
+            img[i[1] + 1:i[1] + self.heat_map_interval_pixel, i[0] + 1:i[0] + self.heat_map_interval_pixel] = self.colormap(value_4)
+        self.profiler.record_time('fill', time.perf_counter() - fill_start)
+        with self.profiler.stage('overlay'):
+            return self.static_overlay.apply(img)
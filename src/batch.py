@@ -0,0 +1,291 @@
+"""
+批量生成热力图: 将多张地图 x 多组参数的任务分配到进程池
+地图数据通过共享内存传给子进程(不pickle), 结果按完成顺序逐个返回
+    python -m src.batch map_a.txt map_b.txt --interval 0.3 0.5 --radius 0.16 0.2 --output out/
+"""
+import argparse
+import collections
+import itertools
+import multiprocessing
+import os
+import queue
+import sys
+import time
+from multiprocessing import resource_tracker, shared_memory
+
+import numpy as np
+
+from .HeatMapCreator import HeatMapCreator
+from .clearance import ClearanceIndex
+from .colormap import COLORMAPS, get_colormap
+from .map_loader import OccupancyGridFrame, iter_occupancy_grids, replay_cache_dir
+
+DEFAULT_OPTIONS = dict(ingest_mode='view', planner='lattice')  # 批量模式下 HeatMapCreator 的默认参数
+
+BatchJob = collections.namedtuple(
+    'BatchJob',
+    [
+        'job_id',  # 任务名称
+        'frame',  # OccupancyGridFrame
+        'heat_map_interval',  # 热力图的测量间隔 [m]
+        'robot_radius',  # 机器人半径 [m]
+        'options',  # HeatMapCreator 的其他参数, 覆盖 DEFAULT_OPTIONS
+        'measurements',  # (Nx2 的世界坐标 [m], N 个测量值), None表示没有测量值
+    ]
+)
+BatchJob.__new__.__defaults__ = (None, None)
+
+BatchResult = collections.namedtuple(
+    'BatchResult',
+    [
+        'job_id',  # 任务名称
+        'points',  # Nx2 的可用测量点坐标 [pixel]
+        'points_world',  # Nx2 的世界坐标系中可用测量点坐标 [m]
+        'png',  # PNG编码的热力图, 未生成时为None
+        'elapsed',  # 子进程中的处理时间 [s]
+        'error',  # 失败时的错误信息, 成功时为None
+    ]
+)
+
+_worker_segment = None  # 子进程中最近一次打开的共享内存(同一张地图的连续任务不再重新打开)
+_worker_clearance = {}  # 子进程中当前地图的可通行索引 {机器人半径 [pixel]: ClearanceIndex}
+
+
+def iter_jobs(frames, heat_map_intervals, robot_radii, options=None, measurements=None):
+    """
+    逐张地图生成参数扫描的任务: 每张地图 x 每个测量间隔 x 每个机器人半径
+    frames为生成器时按需读取地图, 不会一次读入所有地图
+    :param frames: {名称: OccupancyGridFrame} / OccupancyGridFrame 的可迭代对象 / (名称, OccupancyGridFrame) 的可迭代对象
+    :param heat_map_intervals: 测量间隔的列表 [m]
+    :param robot_radii: 机器人半径的列表 [m]
+    :param options: HeatMapCreator 的其他参数
+    :param measurements: {名称: (points_world, values)}, 所有参数组合共用同一张地图的测量值
+    :return: BatchJob 的生成器(同一张地图的任务相邻)
+    """
+    if isinstance(frames, dict):
+        frames = frames.items()
+    measurements = measurements or {}
+    for i, item in enumerate(frames):
+        name, frame = (f'map{i:05d}', item) if isinstance(item, OccupancyGridFrame) else item
+        for interval, radius in itertools.product(heat_map_intervals, robot_radii):
+            yield BatchJob(
+                f'{name}_i{interval:g}_r{radius:g}',
+                frame,
+                interval,
+                radius,
+                options,
+                measurements.get(name)
+            )
+
+
+def make_jobs(frames, heat_map_intervals, robot_radii, options=None, measurements=None) -> list:
+    """
+    同 iter_jobs, 返回列表
+    :return: BatchJob 的列表(同一张地图的任务相邻)
+    """
+    return list(iter_jobs(frames, heat_map_intervals, robot_radii, options, measurements))
+
+
+def _init_worker():
+    """
+    子进程初始化: 预先计算所有内置颜色映射的查找表, 之后的任务直接使用缓存
+    机器人占地范围核在第一次使用时计算并缓存(footprint_kernel), 与任务的传入方式无关
+    """
+    for name in COLORMAPS:
+        get_colormap(name)
+
+
+def _attach_segment(name: str) -> shared_memory.SharedMemory:
+    global _worker_segment
+    if _worker_segment is not None and _worker_segment.name != name:
+        _worker_segment.close()
+        _worker_segment = None
+        _worker_clearance.clear()  # 可通行索引只对应当前地图
+    if _worker_segment is None:
+        _worker_segment = shared_memory.SharedMemory(name=name)
+    return _worker_segment
+
+
+def _clearance_index(robot_radius_pixel: int) -> ClearanceIndex:
+    """
+    当前地图、该机器人半径的可通行索引, 同一张地图的参数扫描中只计算一次整图的可通行地图
+    (ClearanceIndex.query 仍会比较地图指纹, 地图数据不同时重新计算)
+    """
+    index = _worker_clearance.get(robot_radius_pixel)
+    if index is None:
+        index = _worker_clearance[robot_radius_pixel] = ClearanceIndex()
+    return index
+
+
+def _run_job(payload) -> BatchResult:
+    """
+    在子进程中处理一个任务
+    :param payload: (job_id, 共享内存名称, 地图参数, 测量间隔, 机器人半径, HeatMapCreator参数, 测量值, 是否生成PNG)
+    :return: BatchResult
+    """
+    job_id, segment_name, meta, heat_map_interval, robot_radius, options, measurements, render = payload
+    start = time.perf_counter()
+    try:
+        width, height, resolution, origin_x, origin_y = meta
+        segment = _attach_segment(segment_name)
+        data = np.ndarray((width * height,), dtype=np.int8, buffer=segment.buf)
+        creator = HeatMapCreator(heat_map_interval, **options)
+        creator.robot_radius = robot_radius
+        creator.clearance_index = _clearance_index(int(robot_radius / resolution))
+        creator.map_callback(data, width, height, resolution, origin_x, origin_y)
+        points = np.asarray(creator.available_measurement_points, dtype=np.int64).reshape(-1, 2)
+        points_world = np.asarray(creator.available_measurement_points_world, dtype=np.float64).reshape(-1, 2)
+        png = None
+        if render:
+            import cv2  # 只有生成PNG时需要
+
+            if measurements is not None:
+                creator.add_measurements(*measurements)
+            png = cv2.imencode('.png', creator.heatmap_callback())[1].tobytes()
+        # 释放对共享内存的引用, 下一张地图时才能关闭
+        del creator, data
+        return BatchResult(job_id, points, points_world, png, time.perf_counter() - start, None)
+    except Exception as e:
+        return BatchResult(job_id, None, None, None, time.perf_counter() - start, f'{type(e).__name__}: {e}')
+
+
+def _group_by_map(jobs):
+    """
+    将相邻且使用同一张地图(同一个数据对象)的任务分为一组
+    :return: BatchJob 列表的生成器
+    """
+    group = []
+    for job in jobs:
+        if group and job.frame.data is not group[0].frame.data:
+            yield group
+            group = []
+        group.append(job)
+    if group:
+        yield group
+
+
+def _create_segment(frame) -> shared_memory.SharedMemory:
+    """
+    将地图数据复制到新的共享内存
+    """
+    data = np.asarray(frame.data, dtype=np.int8).reshape(-1)
+    segment = shared_memory.SharedMemory(create=True, size=max(data.size, 1))
+    np.ndarray(data.shape, dtype=np.int8, buffer=segment.buf)[:] = data
+    return segment
+
+
+def run_batch(jobs, processes: int = None, render: bool = True, max_maps_in_flight: int = None):
+    """
+    用进程池处理任务, 按完成顺序逐个返回结果
+    任务按地图分组(同一张地图的任务应相邻), 每张地图在开始处理时才复制到共享内存, 该地图的所有任务完成后释放
+    同时处理的地图不超过max_maps_in_flight张, 共享内存和读入的地图不随任务总数增长
+    :param jobs: BatchJob 的可迭代对象(可以是生成器)
+    :param processes: 进程数, None表示CPU核数
+    :param render: 是否生成PNG热力图
+    :param max_maps_in_flight: 同时处理的地图数, None表示与进程数相同
+    :return: BatchResult 的生成器
+    """
+    processes = processes or os.cpu_count() or 1
+    max_maps_in_flight = max(max_maps_in_flight or processes, 1)
+    groups = _group_by_map(jobs)
+    finished = queue.Queue()  # (共享内存名称, BatchResult), 由进程池的结果线程放入
+    segments = {}  # 共享内存名称 -> [SharedMemory, 未完成的任务数]
+
+    def submit_next_map(pool) -> bool:
+        group = next(groups, None)
+        if group is None:
+            return False
+        segment = _create_segment(group[0].frame)
+        segments[segment.name] = [segment, len(group)]
+        for job in group:
+            frame = job.frame
+            payload = (
+                job.job_id,
+                segment.name,
+                (frame.width, frame.height, frame.resolution, frame.origin_x, frame.origin_y),
+                job.heat_map_interval,
+                job.robot_radius,
+                dict(DEFAULT_OPTIONS, **(job.options or {})),
+                job.measurements,
+                render
+            )
+            pool.apply_async(
+                _run_job,
+                (payload,),
+                callback=lambda result, name=segment.name: finished.put((name, result)),
+                error_callback=lambda e, name=segment.name, job_id=job.job_id: finished.put(
+                    (name, BatchResult(job_id, None, None, None, 0.0, f'{type(e).__name__}: {e}'))
+                )
+            )
+        return True
+
+    # 共享内存在进程池启动之后才创建: 先启动资源跟踪进程, 子进程与主进程共用, 否则子进程各自的跟踪进程会在退出时重复清理
+    resource_tracker.ensure_running()
+    try:
+        with multiprocessing.Pool(processes, _init_worker) as pool:
+            while len(segments) < max_maps_in_flight and submit_next_map(pool):
+                pass
+            while segments:
+                name, result = finished.get()
+                segments[name][1] -= 1
+                if segments[name][1] == 0:
+                    segment = segments.pop(name)[0]
+                    segment.close()
+                    segment.unlink()
+                    submit_next_map(pool)
+                yield result
+    finally:
+        for segment, _ in segments.values():
+            segment.close()
+            segment.unlink()
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m src.batch', description='批量生成热力图')
+    parser.add_argument('maps', nargs='+', help='OccupancyGrid转储文件')
+    parser.add_argument('--interval', type=float, nargs='+', default=[0.5], help='热力图的测量间隔 [m]')
+    parser.add_argument('--radius', type=float, nargs='+', default=[0.16], help='机器人半径 [m]')
+    parser.add_argument('--processes', type=int, default=None, help='进程数(默认为CPU核数)')
+    parser.add_argument('--max-maps', type=int, default=None, help='同时处理的地图数(默认与进程数相同)')
+    parser.add_argument('--cache-dir', help='转储文件的二进制缓存目录(每个转储文件一个子目录, 按路径区分)')
+    parser.add_argument('--output', help='保存PNG热力图和测量点(.npy)的目录')
+    parser.add_argument('--no-render', action='store_true', help='只计算测量点, 不生成热力图')
+    return parser.parse_args(argv)
+
+
+def main(argv=None) -> int:
+    args = parse_args(argv)
+
+    def iter_frames():
+        # 逐条读取, 只有正在处理的地图在内存中
+        for path in args.maps:
+            stem = os.path.splitext(os.path.basename(path))[0]
+            cache_dir = replay_cache_dir(args.cache_dir, path) if args.cache_dir else None
+            for i, frame in enumerate(iter_occupancy_grids(path, cache_dir)):
+                yield f'{stem}_{i:05d}', frame
+
+    jobs = iter_jobs(iter_frames(), args.interval, args.radius)
+    if args.output:
+        os.makedirs(args.output, exist_ok=True)
+
+    exit_code = 0
+    start = time.perf_counter()
+    job_count = 0
+    for result in run_batch(jobs, args.processes, render=not args.no_render, max_maps_in_flight=args.max_maps):
+        job_count += 1
+        if result.error is not None:
+            print(f'{result.job_id}: FAILED {result.error}')
+            exit_code = 1
+            continue
+        print(f'{result.job_id}: {len(result.points)}个测量点 {result.elapsed * 1000:.1f}ms')
+        if args.output:
+            np.save(os.path.join(args.output, f'{result.job_id}.npy'), result.points_world)
+            if result.png is not None:
+                with open(os.path.join(args.output, f'{result.job_id}.png'), 'wb') as f:
+                    f.write(result.png)
+    print(f'{job_count}个任务 {time.perf_counter() - start:.2f}s')
+    return exit_code
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,146 @@
+import functools
+import hashlib
+
+import numpy as np
+
+
+@functools.lru_cache(maxsize=None)
+def footprint_kernel(robot_radius_pixel: int) -> tuple:
+    """
+    机器人圆形占地范围的核(按行压缩), 与逐格扫描使用相同的 2r x 2r 窗口
+    :param robot_radius_pixel: 机器人半径 [pixel]
+    :return: ((dy, dx_min, dx_max), ...)
+    """
+    rows = []
+    for dy in range(-robot_radius_pixel, robot_radius_pixel):
+        dxs = [
+            dx for dx in range(-robot_radius_pixel, robot_radius_pixel)
+            if (dx ** 2 + dy ** 2) ** 0.5 <= robot_radius_pixel
+        ]
+        if dxs:
+            rows.append((dy, min(dxs), max(dxs)))
+    return tuple(rows)
+
+
+def compute_clearance_map(grid: np.ndarray, robot_radius_pixel: int) -> np.ndarray:
+    """
+    计算可通行地图: 该格为空闲且机器人占地范围内全部为空闲
+    地图边界以外视为不可通行
+    :param grid: (height, width) 的地图数据, 0为空闲
+    :param robot_radius_pixel: 机器人半径 [pixel]
+    :return: (height, width) 的bool数组
+    """
+    height, width = grid.shape
+    r = robot_radius_pixel
+    clearance_map = np.asarray(grid) == 0
+
+    # 按行对非空闲格做前缀和, 每一行核的判断变为一次差分
+    blocked = np.ones((height + 2 * r, width + 2 * r + 1), dtype=np.int32)
+    blocked[:, 0] = 0
+    blocked[r:r + height, r + 1:r + 1 + width] = ~clearance_map
+    prefix = np.cumsum(blocked, axis=1, out=blocked)
+
+    for dy, dx_min, dx_max in footprint_kernel(r):
+        rows = prefix[r + dy:r + dy + height]
+        count = rows[:, r + dx_max + 1:r + dx_max + 1 + width] - rows[:, r + dx_min:r + dx_min + width]
+        clearance_map &= count == 0
+    return clearance_map
+
+
+def changed_tiles(previous_grid: np.ndarray, grid: np.ndarray, tile_size: int) -> np.ndarray:
+    """
+    比较两张相同尺寸的地图, 找出有变化的分块
+    :param previous_grid: 上一次的地图数据
+    :param grid: 本次的地图数据
+    :param tile_size: 分块大小 [pixel]
+    :return: (ceil(height / tile_size), ceil(width / tile_size)) 的bool数组
+    """
+    height, width = grid.shape
+    tile_rows = -(-height // tile_size)
+    tile_cols = -(-width // tile_size)
+    changed = np.zeros((tile_rows * tile_size, tile_cols * tile_size), dtype=bool)
+    np.not_equal(previous_grid, grid, out=changed[:height, :width])
+    return changed.reshape(tile_rows, tile_size, tile_cols, tile_size).any(axis=(1, 3))
+
+
+def grid_fingerprint(grid: np.ndarray) -> tuple:
+    """
+    地图数据的指纹, 用于判断地图是否变化
+    :param grid: 地图数据
+    :return: (shape, dtype, digest)
+    """
+    if not grid.flags.c_contiguous and grid[::-1].flags.c_contiguous:
+        grid = grid[::-1]  # 上下翻转的视图, 直接对底层数据求摘要
+    digest = hashlib.blake2b(np.ascontiguousarray(grid).data, digest_size=16).digest()
+    return grid.shape, grid.dtype.str, digest
+
+
+class ClearanceIndex:
+    """
+    机器人占地范围的可通行索引
+    每张地图只计算一次, 之后每个候选点的判断为O(1)查表, 直到地图或机器人半径变化
+    只有探索过程中地图不变时才与逐点扫描等价(HeatMapCreator在探索结束后才标记测量点)
+    """
+
+    def __init__(self):
+        self.robot_radius_pixel = None  # 计算时使用的机器人半径 [pixel]
+        self.map_fingerprint = None  # 计算时使用的地图指纹
+        self.clearance_map = None  # 可通行地图
+
+    def query(self, grid: np.ndarray, robot_radius_pixel: int) -> np.ndarray:
+        """
+        获取可通行地图, 地图和半径未变化时直接返回缓存
+        :param grid: (height, width) 的地图数据
+        :param robot_radius_pixel: 机器人半径 [pixel]
+        :return: (height, width) 的bool数组
+        """
+        fingerprint = grid_fingerprint(grid)
+        if (
+                self.clearance_map is None
+                or robot_radius_pixel != self.robot_radius_pixel
+                or fingerprint != self.map_fingerprint
+        ):
+            self.clearance_map = compute_clearance_map(grid, robot_radius_pixel)
+            self.robot_radius_pixel = robot_radius_pixel
+            self.map_fingerprint = fingerprint
+        return self.clearance_map
+
+    def update_tiles(self, grid: np.ndarray, tiles: np.ndarray, tile_size: int) -> list:
+        """
+        只重新计算有变化的分块及其周围机器人半径范围内的可通行地图
+        :param grid: (height, width) 的新地图数据, 尺寸与上一次相同
+        :param tiles: changed_tiles() 得到的变化分块
+        :param tile_size: 分块大小 [pixel]
+        :return: 可通行性可能改变的区域 [(y0, y1, x0, x1), ...]
+        """
+        height, width = grid.shape
+        r = self.robot_radius_pixel
+        regions = []
+        for tile_row in np.flatnonzero(tiles.any(axis=1)):
+            # 同一行中相邻的变化分块合并为一个区域
+            row = np.concatenate([[False], tiles[tile_row], [False]])
+            edges = np.flatnonzero(row[1:] != row[:-1])
+            for start, stop in zip(edges[::2], edges[1::2]):
+                # 占地范围为 [-r, r-1], 受影响的格为变化格的 [-(r-1), r]
+                y0 = max(tile_row * tile_size - r, 0)
+                y1 = min((tile_row + 1) * tile_size + r, height)
+                x0 = max(start * tile_size - r, 0)
+                x1 = min(stop * tile_size + r, width)
+                # 计算时再向外读取r格, 保证区域内的结果与整图计算一致
+                wy0 = max(y0 - r, 0)
+                wx0 = max(x0 - r, 0)
+                window = compute_clearance_map(grid[wy0:min(y1 + r, height), wx0:min(x1 + r, width)], r)
+                self.clearance_map[y0:y1, x0:x1] = window[y0 - wy0:y1 - wy0, x0 - wx0:x1 - wx0]
+                regions.append((y0, y1, x0, x1))
+        self.map_fingerprint = None  # 指纹不再对应, 下次query时整图重新计算
+        return regions
+
+    def is_clear(self, x: int, y: int) -> bool:
+        """
+        查询像素(x, y)处机器人是否可以放置, 地图外返回False
+        :param x: 像素坐标x
+        :param y: 像素坐标y
+        :return: 是否可通行
+        """
+        height, width = self.clearance_map.shape
+        return 0 <= x < width and 0 <= y < height and bool(self.clearance_map[y, x])
@@ -0,0 +1,100 @@
+import functools
+
+import numpy as np
+
+
+def value_to_color(val):
+    """
+    val: 0~1
+    return: [B,G,R] (0~255)
+    """
+    val = np.clip(val, 0.0, 1.0)
+    b, g, r = 0, 0, 0
+    if val <= 0.33:
+        b = 255 * ((0.33 - val) / 0.33)
+        g = 255 * (val / 0.33)
+        r = 0
+    elif 0.33 < val <= 0.66:
+        b = 0
+        g = 255
+        r = 255 * ((val - 0.33) / 0.33)
+    else:
+        b = 0
+        g = 255 * ((1.0 - val) / 0.33)
+        r = 255
+    return [b, g, r]  # OpenCV/ROS 用 BGR 顺序
+
+
+class Colormap:
+    """
+    预先计算的BGR查找表, 一次索引完成整个数组的着色
+    """
+
+    def __init__(self, lut):
+        """
+        :param lut: Nx3 的BGR查找表, 第0项对应0.0, 最后一项对应1.0, 超出0~255的值被截断
+        """
+        self.lut = np.ascontiguousarray(np.clip(np.asarray(lut, dtype=np.float64), 0, 255).astype(np.uint8))
+        if self.lut.ndim != 2 or self.lut.shape[1] != 3 or len(self.lut) < 2:
+            raise ValueError(f'查找表必须为Nx3 (N>=2): {self.lut.shape}')
+
+    @classmethod
+    def from_function(cls, color_function, size: int = 1024):
+        """
+        对标量颜色函数采样生成查找表
+        :param color_function: val(0~1) -> [B,G,R]
+        :param size: 查找表大小
+        :return: Colormap
+        """
+        return cls([color_function(v) for v in np.linspace(0.0, 1.0, size)])
+
+    @classmethod
+    def from_colors(cls, colors, size: int = 1024):
+        """
+        由等间隔的BGR控制色线性插值生成查找表
+        :param colors: [(B,G,R), ...] 从0.0到1.0
+        :param size: 查找表大小
+        :return: Colormap
+        """
+        colors = np.asarray(colors, dtype=np.float64)
+        stops = np.linspace(0.0, 1.0, len(colors))
+        samples = np.linspace(0.0, 1.0, size)
+        return cls(np.stack([np.interp(samples, stops, colors[:, k]) for k in range(3)], axis=1))
+
+    def __len__(self):
+        return len(self.lut)
+
+    def __call__(self, values, out: np.ndarray = None) -> np.ndarray:
+        """
+        :param values: 0~1 的标量或数组, 超出范围的值被截断, NaN按0处理
+        :param out: 写入结果的 (..., 3) uint8数组, None表示新建
+        :return: (..., 3) 的uint8 BGR
+        """
+        values = np.nan_to_num(np.asarray(values, dtype=np.float64), nan=0.0)
+        index = np.rint(np.clip(values, 0.0, 1.0) * (len(self.lut) - 1)).astype(np.intp)
+        return np.take(self.lut, index, axis=0, out=out, mode='clip')
+
+
+COLORMAPS = {
+    'blue_green_red': lambda: Colormap.from_function(value_to_color),
+    'gray': lambda: Colormap.from_colors([(0, 0, 0), (255, 255, 255)]),
+}  # 内置颜色映射
+
+
+@functools.lru_cache(maxsize=None)
+def _builtin_colormap(name: str) -> Colormap:
+    if name not in COLORMAPS:
+        raise ValueError(f'未知的颜色映射: {name}')
+    return COLORMAPS[name]()
+
+
+def get_colormap(colormap) -> Colormap:
+    """
+    :param colormap: 内置颜色映射名称 / Colormap / BGR控制色列表
+    :return: Colormap (内置颜色映射的查找表只计算一次)
+    """
+    if isinstance(colormap, Colormap):
+        return colormap
+    if isinstance(colormap, str):
+        return _builtin_colormap(colormap)
+    return Colormap.from_colors(colormap)
@@ -0,0 +1,207 @@
+import cv2
+import numpy as np
+
+
+class Lattice:
+    """
+    测量点格网: 以像素坐标系中的世界坐标系原点为锚点, 间隔为heat_map_interval_pixel
+    只包含落在地图范围内的格点
+    """
+
+    def __init__(
+            self,
+            origin_x_pixel: int,
+            origin_y_pixel: int,
+            interval_pixel: int,
+            width_pixel: int,
+            height_pixel: int,
+    ):
+        """
+        :param origin_x_pixel: 像素坐标系中的世界坐标系原点x坐标 [pixel]
+        :param origin_y_pixel: 像素坐标系中的世界坐标系原点y坐标 [pixel]
+        :param interval_pixel: 测量间隔 [pixel]
+        :param width_pixel: 地图的宽度 [pixel]
+        :param height_pixel: 地图的高度 [pixel]
+        """
+        if interval_pixel <= 0:
+            raise ValueError(f'测量间隔必须大于0 [pixel]: {interval_pixel}')
+        self.origin_x_pixel = origin_x_pixel
+        self.origin_y_pixel = origin_y_pixel
+        self.interval_pixel = interval_pixel
+        self.width_pixel = width_pixel
+        self.height_pixel = height_pixel
+
+        # 地图范围内格点编号(相对原点)的最小值
+        self.col_min = -(origin_x_pixel // interval_pixel)
+        self.row_min = -(origin_y_pixel // interval_pixel)
+        col_max = (width_pixel - 1 - origin_x_pixel) // interval_pixel
+        row_max = (height_pixel - 1 - origin_y_pixel) // interval_pixel
+
+        self.xs = origin_x_pixel + interval_pixel * np.arange(self.col_min, col_max + 1)  # 各列格点的x坐标 [pixel]
+        self.ys = origin_y_pixel + interval_pixel * np.arange(self.row_min, row_max + 1)  # 各行格点的y坐标 [pixel]
+        self.shape = (len(self.ys), len(self.xs))
+        self.origin_index = (-self.row_min, -self.col_min)  # 原点所在的格网行列
+
+    def contains_origin(self) -> bool:
+        """
+        :return: 世界坐标系原点是否在地图范围内
+        """
+        return 0 <= self.origin_index[0] < self.shape[0] and 0 <= self.origin_index[1] < self.shape[1]
+
+    def node_index(self, x, y, tolerance: int = 0):
+        """
+        将像素坐标吸附到最近的格点
+        :param x: 像素坐标x (标量或数组)
+        :param y: 像素坐标y (标量或数组)
+        :param tolerance: 允许偏离格点的最大距离 [pixel]
+        :return: (rows, cols, valid) valid为False的点不在格网内或偏离超过tolerance
+        """
+        x = np.asarray(x)
+        y = np.asarray(y)
+        col = np.floor((x - self.origin_x_pixel) / self.interval_pixel + 0.5).astype(np.int64)
+        row = np.floor((y - self.origin_y_pixel) / self.interval_pixel + 0.5).astype(np.int64)
+        valid = (
+                (np.abs(x - (self.origin_x_pixel + col * self.interval_pixel)) <= tolerance)
+                & (np.abs(y - (self.origin_y_pixel + row * self.interval_pixel)) <= tolerance)
+        )
+        rows = row - self.row_min
+        cols = col - self.col_min
+        valid &= (0 <= rows) & (rows < self.shape[0]) & (0 <= cols) & (cols < self.shape[1])
+        return rows, cols, valid
+
+    def node_pixels(self, rows, cols) -> np.ndarray:
+        """
+        :param rows: 格网行
+        :param cols: 格网列
+        :return: Nx2 的像素坐标 [x, y]
+        """
+        return np.stack([self.xs[cols], self.ys[rows]], axis=1)
+
+    def world_node_index(self, points_world, resolution: float):
+        """
+        将世界坐标吸附到最近的格点, 允许偏离半个测量间隔
+        :param points_world: Nx2 的世界坐标 [m]
+        :param resolution: 地图的分辨率 [m/pixel]
+        :return: 同 node_index
+        """
+        points_world = np.asarray(points_world, dtype=np.float64).reshape(-1, 2)
+        return self.node_index(
+            self.origin_x_pixel + points_world[:, 0] / resolution,
+            self.origin_y_pixel - points_world[:, 1] / resolution,
+            self.interval_pixel / 2
+        )
+
+    def pixels_to_world(self, points, resolution: float) -> np.ndarray:
+        """
+        :param points: Nx2 的像素坐标 [x, y]
+        :param resolution: 地图的分辨率 [m/pixel]
+        :return: Nx2 的世界坐标 [m]
+        """
+        points = np.asarray(points).reshape(-1, 2)
+        return np.stack([
+            (points[:, 0] - self.origin_x_pixel) * resolution,
+            -(points[:, 1] - self.origin_y_pixel) * resolution
+        ], axis=1)
+
+
+def flood_fill(mask: np.ndarray, seed: tuple) -> np.ndarray:
+    """
+    从seed出发在mask上做4邻域连通填充(seed本身不要求在mask内)
+    一次连通域标记, 耗时与格点数成正比
+    :param mask: 可通过的格点
+    :param seed: (row, col)
+    :return: 与seed连通的格点
+    """
+    passable = np.asarray(mask).astype(np.uint8)
+    passable[seed] = 1
+    _, labels = cv2.connectedComponents(passable, connectivity=4)
+    return (labels == labels[seed]) & mask
+
+
+def plan_measurement_points(lattice: Lattice, clearance_map: np.ndarray, connectivity: str = 'lattice') -> np.ndarray:
+    """
+    批量计算可用测量点
+    :param lattice: 测量点格网
+    :param clearance_map: 可通行地图 (height, width) bool
+    :param connectivity: 'lattice': 与逐点BFS相同, 格网内所有格点都视为与原点连通
+                         'free': 只保留经由可用格点与原点4邻域连通的格点
+    :return: 格网上可用格点的 (ny, nx) bool数组
+    """
+    return select_measurement_points(lattice, clearance_map[np.ix_(lattice.ys, lattice.xs)], connectivity)
+
+
+def select_measurement_points(lattice: Lattice, node_clearance: np.ndarray, connectivity: str = 'lattice') -> np.ndarray:
+    """
+    由格点处的可通行性选出可用测量点
+    :param lattice: 测量点格网
+    :param node_clearance: 格点处的可通行性 (ny, nx) bool
+    :param connectivity: 同 plan_measurement_points
+    :return: 格网上可用格点的 (ny, nx) bool数组
+    """
+    if connectivity not in ('lattice', 'free'):
+        raise ValueError(f'未知的连通方式: {connectivity}')
+    if not lattice.contains_origin():
+        return np.zeros_like(node_clearance)
+    available = node_clearance.copy()
+    available[lattice.origin_index] = False  # 原点本身不作为测量点
+    if connectivity == 'free':
+        available = flood_fill(available, lattice.origin_index)
+    return available
+
+
+def cell_averages(sums: np.ndarray, counts: np.ndarray) -> np.ndarray:
+    """
+    每个格网单元四个角上测量点的平均值, 即各测量点四个象限的平均值
+    单元k位于第k-1和第k行(列)格点之间, 外围单元只有一侧有格点
+    :param sums: (ny, nx) 的测量值之和
+    :param counts: (ny, nx) 的测量值个数
+    :return: (ny + 1, nx + 1) 的平均值, 四个角都没有测量值的单元为NaN
+    """
+    # 外围补一圈0, 每个单元都是一个2x2窗口的和
+    padded_sums = np.pad(np.asarray(sums, dtype=np.float64), 1)
+    padded_counts = np.pad(np.asarray(counts, dtype=np.float64), 1)
+    box_sums = padded_sums[:-1, :-1] + padded_sums[1:, :-1] + padded_sums[:-1, 1:] + padded_sums[1:, 1:]
+    box_counts = padded_counts[:-1, :-1] + padded_counts[1:, :-1] + padded_counts[:-1, 1:] + padded_counts[1:, 1:]
+    averages = np.full(box_sums.shape, np.nan)
+    np.divide(box_sums, box_counts, out=averages, where=box_counts > 0)
+    return averages
+
+
+def node_cell_averages(node_values: np.ndarray) -> np.ndarray:
+    """
+    同 cell_averages, 输入为各格点的值
+    :param node_values: (ny, nx) 的格点值, 没有值的格点为NaN
+    :return: (ny + 1, nx + 1) 的平均值, 四个角都没有值的单元为NaN
+    """
+    measured = ~np.isnan(node_values)
+    return cell_averages(np.where(measured, node_values, 0.0), measured)
+
+
+def cell_averages_at(
+        node_values: np.ndarray,
+        cell_rows: np.ndarray,
+        cell_cols: np.ndarray,
+        node_mask: np.ndarray = None,
+) -> np.ndarray:
+    """
+    只计算指定格网单元四个角上测量值的平均值, 结果与 cell_averages 相同
+    :param node_values: (ny, nx) 的格点测量值, 没有测量的格点为NaN
+    :param node_mask: (ny, nx) 参与计算的格点, None表示全部
+    :param cell_rows: 单元行 (0~ny)
+    :param cell_cols: 单元列 (0~nx)
+    :return: 各单元的平均值, 四个角都没有测量值的单元为NaN
+    """
+    # 单元(r, c)的四个角为格点 (r-1, c-1), (r-1, c), (r, c-1), (r, c)
+    rows = np.asarray(cell_rows)[:, None] + np.array([-1, -1, 0, 0])
+    cols = np.asarray(cell_cols)[:, None] + np.array([-1, 0, -1, 0])
+    inside = (0 <= rows) & (rows < node_values.shape[0]) & (0 <= cols) & (cols < node_values.shape[1])
+    values = np.full(rows.shape, np.nan)
+    values[inside] = node_values[rows[inside], cols[inside]]
+    if node_mask is not None:
+        values[inside] = np.where(node_mask[rows[inside], cols[inside]], values[inside], np.nan)
+    present = ~np.isnan(values)
+    sums = np.where(present, values, 0.0).sum(axis=1)
+    counts = present.sum(axis=1)
+    averages = np.full(len(sums), np.nan)
+    np.divide(sums, counts, out=averages, where=counts > 0)
+    return averages
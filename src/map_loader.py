@@ -0,0 +1,180 @@
+import collections
+import hashlib
+import json
+import os
+import re
+
+import numpy as np
+
+MESSAGE_SEPARATOR = '=== OccupancyGrid Message ==='  # 每条消息的开头
+CACHE_INDEX_FILE = 'index.json'  # 缓存目录中的索引文件
+
+OccupancyGridFrame = collections.namedtuple(
+    'OccupancyGridFrame',
+    [
+        'data',  # 原始地图的数据 一维int8数组
+        'width',  # 原始地图的宽度 [pixel]
+        'height',  # 原始地图的高度 [pixel]
+        'resolution',  # 原始地图的分辨率 [m/pixel]
+        'origin_x',  # 原始地图原点x轴坐标 [m]
+        'origin_y',  # 原始地图原点y轴坐标 [m]
+        'stamp_sec',  # 时间戳 [s]
+        'stamp_nanosec',  # 时间戳 [ns]
+        'frame_id',  # 坐标系
+    ]
+)
+OccupancyGridFrame.__doc__ = """
+一条/map消息, 前6项与 HeatMapCreator.map_callback 的参数顺序相同:
+    creator.map_callback(*frame[:6])
+"""
+
+_HEADER_PATTERN = re.compile(r"sec=(-?\d+), nanosec=(\d+)\), frame_id='([^']*)'")
+_INFO_PATTERN = re.compile(
+    r'width=(\d+), height=(\d+), resolution=([-+.\deE]+), '
+    r'origin=.*?position=.*?x=([-+.\deE]+), y=([-+.\deE]+)'
+)
+
+
+def parse_data_array(text: str) -> np.ndarray:
+    """
+    解析 array('b', [...]) 或 [...] 形式的数据
+    :param text: 数据文本
+    :return: 一维int8数组
+    """
+    start = text.index('[') + 1
+    stop = text.rindex(']')
+    return np.fromstring(text[start:stop], dtype=np.int8, sep=',')
+
+
+def iter_occupancy_grid_dump(path: str):
+    """
+    逐条读取OccupancyGrid消息的文本转储(不会一次读入整个文件)
+    :param path: 转储文件路径
+    :return: OccupancyGridFrame 的生成器
+    """
+    fields = {}
+    with open(path, 'r') as f:
+        for line in f:
+            line = line.strip()
+            if line == MESSAGE_SEPARATOR:
+                fields = {}
+            elif line.startswith('header:'):
+                match = _HEADER_PATTERN.search(line)
+                if match:
+                    fields['stamp_sec'] = int(match.group(1))
+                    fields['stamp_nanosec'] = int(match.group(2))
+                    fields['frame_id'] = match.group(3)
+            elif line.startswith('info:'):
+                match = _INFO_PATTERN.search(line)
+                if match is None:
+                    raise ValueError(f'无法解析地图信息: {line[:200]}')
+                fields['width'] = int(match.group(1))
+                fields['height'] = int(match.group(2))
+                # resolution是float32，转储中是展开后的double(0.05000000074505806)，还原为float32的最短表示
+                fields['resolution'] = float(str(np.float32(match.group(3))))
+                fields['origin_x'] = float(match.group(4))
+                fields['origin_y'] = float(match.group(5))
+            elif line.startswith('array(') or line.startswith('['):
+                data = parse_data_array(line)
+                if data.size != fields['width'] * fields['height']:
+                    raise ValueError(f"数据长度{data.size}与尺寸{fields['width']}x{fields['height']}不符")
+                yield OccupancyGridFrame(
+                    data,
+                    fields['width'],
+                    fields['height'],
+                    fields['resolution'],
+                    fields['origin_x'],
+                    fields['origin_y'],
+                    fields.get('stamp_sec', 0),
+                    fields.get('stamp_nanosec', 0),
+                    fields.get('frame_id', '')
+                )
+                fields = {}
+
+
+def build_replay_cache(dump_path: str, cache_dir: str) -> int:
+    """
+    将文本转储转换为二进制缓存: 每条消息一个.npy文件, 元数据保存在index.json
+    :param dump_path: 转储文件路径
+    :param cache_dir: 缓存目录
+    :return: 消息条数
+    """
+    os.makedirs(cache_dir, exist_ok=True)
+    source = _source_signature(dump_path)  # 转换前记录, 转换过程中被修改的转储文件下次会重新转换
+    index = []
+    for i, frame in enumerate(iter_occupancy_grid_dump(dump_path)):
+        file_name = f'frame_{i:05d}.npy'
+        np.save(os.path.join(cache_dir, file_name), frame.data)
+        meta = frame._asdict()
+        meta['data'] = file_name
+        index.append(meta)
+    # 最后写索引, 中途失败的缓存不会被当作有效缓存
+    with open(os.path.join(cache_dir, CACHE_INDEX_FILE), 'w') as f:
+        json.dump(dict(source, frames=index), f, indent=1)
+    return len(index)
+
+
+def iter_replay_cache(cache_dir: str, mmap: bool = True):
+    """
+    从二进制缓存逐条读取消息
+    :param cache_dir: 缓存目录
+    :param mmap: 是否以内存映射方式读取数据(不复制, 立即返回)
+    :return: OccupancyGridFrame 的生成器
+    """
+    with open(os.path.join(cache_dir, CACHE_INDEX_FILE), 'r') as f:
+        index = json.load(f)
+    for meta in index['frames']:
+        meta = dict(meta)
+        meta['data'] = np.load(os.path.join(cache_dir, meta['data']), mmap_mode='r' if mmap else None)
+        yield OccupancyGridFrame(**meta)
+
+
+def _source_signature(dump_path: str) -> dict:
+    """
+    :return: 转储文件的绝对路径、大小和修改时间, 保存在缓存索引中
+    """
+    stat = os.stat(dump_path)
+    return {'source': os.path.abspath(dump_path), 'source_size': stat.st_size, 'source_mtime_ns': stat.st_mtime_ns}
+
+
+def is_cache_fresh(dump_path: str, cache_dir: str) -> bool:
+    """
+    :param dump_path: 转储文件路径
+    :param cache_dir: 缓存目录
+    :return: 缓存是否由这个转储文件生成, 且转储文件此后没有变化(路径、大小和修改时间都相同)
+    """
+    try:
+        with open(os.path.join(cache_dir, CACHE_INDEX_FILE), 'r') as f:
+            index = json.load(f)
+    except (OSError, ValueError):
+        return False
+    return all(index.get(key) == value for key, value in _source_signature(dump_path).items())
+
+
+def replay_cache_dir(cache_root: str, dump_path: str) -> str:
+    """
+    多个转储文件共用一个缓存根目录时, 每个转储文件的缓存目录
+    由文件名和绝对路径的哈希组成, 不同目录下的同名文件不会共用缓存
+    :param cache_root: 缓存根目录
+    :param dump_path: 转储文件路径
+    :return: 缓存目录
+    """
+    stem = os.path.splitext(os.path.basename(dump_path))[0]
+    digest = hashlib.sha1(os.path.abspath(dump_path).encode('utf-8')).hexdigest()[:12]
+    return os.path.join(cache_root, f'{stem}_{digest}')
+
+
+def iter_occupancy_grids(dump_path: str, cache_dir: str = None, mmap: bool = True):
+    """
+    回放OccupancyGrid转储, 指定cache_dir时第一次转换为二进制缓存, 之后直接从缓存读取
+    :param dump_path: 转储文件路径
+    :param cache_dir: 缓存目录, None表示每次都解析文本
+    :param mmap: 从缓存读取时是否使用内存映射
+    :return: OccupancyGridFrame 的生成器
+    """
+    if cache_dir is None:
+        yield from iter_occupancy_grid_dump(dump_path)
+        return
+    if not is_cache_fresh(dump_path, cache_dir):
+        build_replay_cache(dump_path, cache_dir)
+    yield from iter_replay_cache(cache_dir, mmap)
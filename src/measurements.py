@@ -0,0 +1,88 @@
+import numpy as np
+
+from .lattice import Lattice
+
+
+class MeasurementGrid:
+    """
+    格网上每个格点测量值的累计统计(个数、总和、最小值、最大值、平均值)
+    """
+
+    def __init__(self, lattice: Lattice):
+        """
+        :param lattice: 测量点格网
+        """
+        self.key = lattice_key(lattice)  # 对应的格网(原点、间隔、尺寸)
+        self.count = np.zeros(lattice.shape, dtype=np.int64)  # 测量次数
+        self.sum = np.zeros(lattice.shape)  # 测量值之和
+        self.min = np.full(lattice.shape, np.inf)  # 最小测量值
+        self.max = np.full(lattice.shape, -np.inf)  # 最大测量值
+        self.mean = np.full(lattice.shape, np.nan)  # 平均测量值, 没有测量的格点为NaN
+
+    def add(self, rows: np.ndarray, cols: np.ndarray, values: np.ndarray):
+        """
+        累加一批测量值, 同一格点可以出现多次
+        :param rows: 格网行
+        :param cols: 格网列
+        :param values: 测量值
+        :return: 被更新的格点 (rows, cols), 不重复
+        """
+        index = (rows, cols)
+        np.add.at(self.count, index, 1)
+        np.add.at(self.sum, index, values)
+        np.minimum.at(self.min, index, values)
+        np.maximum.at(self.max, index, values)
+        flat = np.unique(np.ravel_multi_index(index, self.count.shape))
+        updated = np.unravel_index(flat, self.count.shape)
+        self.mean[updated] = self.sum[updated] / self.count[updated]
+        return updated
+
+    def brightness(self, available: np.ndarray) -> np.ndarray:
+        """
+        :param available: (ny, nx) 的可用格点
+        :return: (ny, nx) 的平均测量值, 没有测量值或不是可用格点的格点为NaN
+        """
+        return np.where(available, self.mean, np.nan)
+
+
+def snap_measurements(lattice: Lattice, available: np.ndarray, resolution: float, points, values):
+    """
+    将一批测量值吸附到最近的格点, 丢弃最近的格点不是可用格点的测量值和NaN
+    :param lattice: 测量点格网
+    :param available: (ny, nx) 的可用格点
+    :param resolution: 地图的分辨率 [m/pixel]
+    :param points: Nx2 的世界坐标 [m]
+    :param values: N 个测量值
+    :return: 被采用的测量值的 (格网行, 格网列, 测量值)
+    """
+    values = np.asarray(values, dtype=np.float64).reshape(-1)
+    rows, cols, valid = lattice.world_node_index(points, resolution)
+    valid[valid] = available[rows[valid], cols[valid]]
+    valid &= ~np.isnan(values)
+    return rows[valid], cols[valid], values[valid]
+
+
+def brightness_range(node_brightness: np.ndarray) -> tuple:
+    """
+    :param node_brightness: 各格点的平均测量值, NaN表示没有测量值
+    :return: 热力图归一化使用的 (最小值, 最大值), 没有测量值时为 (0.0, 0.0)
+    """
+    measured = ~np.isnan(node_brightness)
+    if not measured.any():
+        return 0.0, 0.0
+    return float(node_brightness[measured].min()), float(node_brightness[measured].max())
+
+
+def normalize_brightness(values, brightness_min: float, brightness_max: float):
+    """
+    :return: 归一化到 0~1 的测量值, 最大值与最小值相同时只减去最小值
+    """
+    return (values - brightness_min) / ((brightness_max - brightness_min) or 1.0)
+
+
+def lattice_key(lattice: Lattice) -> tuple:
+    """
+    :param lattice: 测量点格网
+    :return: 用于判断两个格网是否相同的键
+    """
+    return lattice.origin_x_pixel, lattice.origin_y_pixel, lattice.interval_pixel, lattice.shape
@@ -0,0 +1,137 @@
+import contextlib
+import logging
+import time
+
+
+class InMemoryStats:
+    """
+    在内存中累计各阶段耗时和计数
+    """
+
+    def __init__(self):
+        self.timings = {}  # 阶段名 -> {'calls', 'total', 'min', 'max', 'last'} [s]
+        self.counters = {}  # 计数名 -> 累计值
+
+    def record_time(self, name: str, seconds: float):
+        stats = self.timings.get(name)
+        if stats is None:
+            self.timings[name] = {'calls': 1, 'total': seconds, 'min': seconds, 'max': seconds, 'last': seconds}
+        else:
+            stats['calls'] += 1
+            stats['total'] += seconds
+            stats['min'] = min(stats['min'], seconds)
+            stats['max'] = max(stats['max'], seconds)
+            stats['last'] = seconds
+
+    def record_count(self, name: str, value: int):
+        self.counters[name] = self.counters.get(name, 0) + value
+
+    def reset(self):
+        self.timings.clear()
+        self.counters.clear()
+
+    def summary(self) -> str:
+        """
+        :return: 各阶段平均耗时和计数的文本
+        """
+        lines = [
+            f'{name}: {stats["total"] / stats["calls"] * 1000:.3f}ms x{stats["calls"]}'
+            for name, stats in self.timings.items()
+        ]
+        lines += [f'{name}: {value}' for name, value in self.counters.items()]
+        return '\n'.join(lines)
+
+
+class CallbackSink:
+    """
+    每个事件调用一次 callback(kind, name, value), kind为'time'[s]或'count'
+    """
+
+    def __init__(self, callback):
+        self.callback = callback
+
+    def record_time(self, name: str, seconds: float):
+        self.callback('time', name, seconds)
+
+    def record_count(self, name: str, value: int):
+        self.callback('count', name, value)
+
+
+class LoggerSink:
+    """
+    将事件写入logging.Logger
+    """
+
+    def __init__(self, logger: logging.Logger, level: int = logging.DEBUG):
+        self.logger = logger
+        self.level = level
+
+    def record_time(self, name: str, seconds: float):
+        self.logger.log(self.level, '%s: %.3fms', name, seconds * 1000)
+
+    def record_count(self, name: str, value: int):
+        self.logger.log(self.level, '%s: %d', name, value)
+
+
+def make_sink(sink):
+    """
+    :param sink: InMemoryStats等带 record_time/record_count 的对象 / logging.Logger / 可调用对象
+    :return: sink
+    """
+    if isinstance(sink, logging.Logger):
+        return LoggerSink(sink)
+    if hasattr(sink, 'record_time') and hasattr(sink, 'record_count'):
+        return sink
+    if callable(sink):
+        return CallbackSink(sink)
+    raise TypeError(f'不支持的sink: {sink!r}')
+
+
+class StageProfiler:
+    """
+    分阶段计时和计数, 结果交给sink
+    """
+    enabled = True
+
+    def __init__(self, sink):
+        """
+        :param sink: 见 make_sink
+        """
+        self.sink = make_sink(sink)
+
+    @contextlib.contextmanager
+    def stage(self, name: str):
+        """
+        with profiler.stage('explore'): ...
+        """
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.sink.record_time(name, time.perf_counter() - start)
+
+    def record_time(self, name: str, seconds: float):
+        self.sink.record_time(name, seconds)
+
+    def count(self, name: str, value: int = 1):
+        self.sink.record_count(name, value)
+
+
+class NullProfiler:
+    """
+    不记录任何内容的profiler, 未指定sink时使用
+    """
+    enabled = False
+    _null_context = contextlib.nullcontext()
+
+    def stage(self, name: str):
+        return self._null_context
+
+    def record_time(self, name: str, seconds: float):
+        pass
+
+    def count(self, name: str, value: int = 1):
+        pass
+
+
+NULL_PROFILER = NullProfiler()
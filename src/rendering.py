@@ -0,0 +1,426 @@
+import functools
+
+import numpy as np
+
+from .colormap import Colormap
+from .lattice import Lattice
+from .profiling import NULL_PROFILER
+
+
+_PIXEL = np.dtype('V3')  # 一个BGR像素
+
+
+def pixel_cell_index(lattice: Lattice, height_pixel: int, width_pixel: int):
+    """
+    每一行/列像素所属的格网单元编号
+    单元k位于第k-1和第k条格网线之间, 格网线本身归入其下方/右侧的单元
+    :param lattice: 测量点格网
+    :param height_pixel: 图像高度 [pixel]
+    :param width_pixel: 图像宽度 [pixel]
+    :return: (rows, cols) 取值范围分别为 0~ny, 0~nx
+    """
+    y0 = lattice.origin_y_pixel + lattice.row_min * lattice.interval_pixel
+    x0 = lattice.origin_x_pixel + lattice.col_min * lattice.interval_pixel
+    rows = np.clip((np.arange(height_pixel) - y0) // lattice.interval_pixel + 1, 0, lattice.shape[0])
+    cols = np.clip((np.arange(width_pixel) - x0) // lattice.interval_pixel + 1, 0, lattice.shape[1])
+    return rows, cols
+
+
+def render_cells(
+        lattice: Lattice,
+        cell_values: np.ndarray,
+        colormap: Colormap,
+        height_pixel: int,
+        width_pixel: int,
+        background=(150, 150, 150),
+        out: np.ndarray = None,
+) -> np.ndarray:
+    """
+    将格网单元的值着色并一次放大到像素分辨率
+    :param lattice: 测量点格网
+    :param cell_values: (ny + 1, nx + 1) 的单元值 (0~1), NaN表示不着色
+    :param colormap: 颜色映射
+    :param height_pixel: 图像高度 [pixel]
+    :param width_pixel: 图像宽度 [pixel]
+    :param background: 不着色单元的BGR
+    :param out: 写入结果的 (height, width, 3) uint8数组, None表示新建
+    :return: (height, width, 3) 的uint8图像
+    """
+    cell_colors = colormap(cell_values)
+    cell_colors[np.isnan(cell_values)] = background
+    rows, cols = pixel_cell_index(lattice, height_pixel, width_pixel)
+    return np.take(cell_colors[rows], cols, axis=1, out=out, mode='clip')
+
+
+def bilinear_weights(dy: np.ndarray, dx: np.ndarray, interval_pixel: int) -> np.ndarray:
+    """
+    双线性插值的权重
+    :param dy: 格点相对像素的y偏移 [pixel]
+    :param dx: 格点相对像素的x偏移 [pixel]
+    :param interval_pixel: 测量间隔 [pixel]
+    :return: 权重
+    """
+    return np.clip(1 - np.abs(dy) / interval_pixel, 0, None) * np.clip(1 - np.abs(dx) / interval_pixel, 0, None)
+
+
+def idw_weights(dy: np.ndarray, dx: np.ndarray, interval_pixel: int, power: float = 2.0) -> np.ndarray:
+    """
+    反距离加权(修正Shepard法)的权重, 距离达到2个测量间隔时权重平滑地降为0
+    :param dy: 格点相对像素的y偏移 [pixel]
+    :param dx: 格点相对像素的x偏移 [pixel]
+    :param interval_pixel: 测量间隔 [pixel]
+    :param power: 距离的幂
+    :return: 权重
+    """
+    support = 2 * interval_pixel
+    distance = np.maximum(np.hypot(dy, dx), 1e-3)  # 像素恰好在格点上时权重取很大的有限值
+    return (np.clip(support - distance, 0, None) / (support * distance)) ** power
+
+
+INTERPOLATION_ENGINES = {
+    'bilinear': (1, bilinear_weights),
+    'idw': (2, idw_weights),
+}  # 插值渲染引擎 名称 -> (参与插值的格点范围 [格点], 权重函数)
+RENDER_ENGINES = ('quadrant',) + tuple(INTERPOLATION_ENGINES)  # 'quadrant': 各象限平均值填充格网单元
+
+
+@functools.lru_cache(maxsize=None)
+def _stencil_weights(weight_function, stencil_radius: int, interval_pixel: int):
+    """
+    格网单元内每个像素偏移对周围各格点的权重, 对所有单元相同, 每个测量间隔只计算一次
+    :return: (stencil, weights) stencil为格点相对单元左上角格点的 (dy, dx) 列表 [格点],
+             weights为 (len(stencil), interval, interval) 的float32数组
+    """
+    steps = range(1 - stencil_radius, stencil_radius + 1)
+    stencil = [(dy, dx) for dy in steps for dx in steps]
+    offsets = np.arange(interval_pixel)
+    weights = np.stack([
+        weight_function(
+            dy * interval_pixel - offsets[:, None],
+            dx * interval_pixel - offsets[None, :],
+            interval_pixel
+        )
+        for dy, dx in stencil
+    ]).astype(np.float32)
+    weights.setflags(write=False)
+    return stencil, weights
+
+
+def interpolate_lattice(
+        lattice: Lattice,
+        node_values: np.ndarray,
+        engine: str,
+        height_pixel: int,
+        width_pixel: int,
+) -> np.ndarray:
+    """
+    将格点上的测量值插值到像素分辨率
+    先在格网分辨率上取出每个单元周围的格点值, 再用预先计算的权重一次矩阵乘法放大到像素
+    :param lattice: 测量点格网
+    :param node_values: (ny, nx) 的格点值, NaN表示没有测量值(不参与插值)
+    :param engine: INTERPOLATION_ENGINES 中的名称
+    :param height_pixel: 图像高度 [pixel]
+    :param width_pixel: 图像宽度 [pixel]
+    :return: (height, width) 的float32数组, 周围没有测量值的像素为NaN
+    """
+    if engine not in INTERPOLATION_ENGINES:
+        raise ValueError(f'未知的插值渲染引擎: {engine}')
+    result = np.full((height_pixel, width_pixel), np.nan, dtype=np.float32)
+    if node_values.size == 0:
+        return result
+    stencil_radius, weight_function = INTERPOLATION_ENGINES[engine]
+    interval = lattice.interval_pixel
+    stencil, weights = _stencil_weights(weight_function, stencil_radius, interval)
+
+    # 单元k位于第k-1和第k个格点之间(k = 0 ~ n), 外围补0(没有测量值)
+    ny, nx = node_values.shape
+    measured = ~np.isnan(node_values)
+    pad = stencil_radius
+    padded_values = np.pad(np.where(measured, node_values, 0.0).astype(np.float32), pad)
+    padded_counts = np.pad(measured.astype(np.float32), pad)
+    values = np.stack([
+        padded_values[pad - 1 + dy:pad + ny + dy, pad - 1 + dx:pad + nx + dx]
+        for dy, dx in stencil
+    ], axis=-1)
+    counts = np.stack([
+        padded_counts[pad - 1 + dy:pad + ny + dy, pad - 1 + dx:pad + nx + dx]
+        for dy, dx in stencil
+    ], axis=-1)
+
+    # (ny + 1, nx + 1, 格点) x (格点, interval, interval) -> 每个单元的像素块
+    flat_weights = weights.reshape(len(stencil), -1)
+    numerator = (values @ flat_weights).reshape(ny + 1, nx + 1, interval, interval)
+    denominator = (counts @ flat_weights).reshape(ny + 1, nx + 1, interval, interval)
+    blocks = np.full(numerator.shape, np.nan, dtype=np.float32)
+    np.divide(numerator, denominator, out=blocks, where=denominator > 0)
+    pixels = blocks.transpose(0, 2, 1, 3).reshape((ny + 1) * interval, (nx + 1) * interval)
+
+    # 第0个单元从第一个格点之前一个测量间隔处开始
+    y0 = interval - int(lattice.ys[0])
+    x0 = interval - int(lattice.xs[0])
+    result[:] = pixels[y0:y0 + height_pixel, x0:x0 + width_pixel]
+    return result
+
+
+def overlay_layer(lattice: Lattice, grid: np.ndarray, measurement_points, y0: int = 0, x0: int = 0) -> np.ndarray:
+    """
+    静态图层的图层编号(0: 无 1: 网格线 2: 障碍物 3: 原点 4: 测量点), 后绘制的图层覆盖先绘制的图层
+    :param lattice: 测量点格网
+    :param grid: 地图数据中 [y0, y0 + h) x [x0, x0 + w) 的区域, 大于1的格视为障碍物
+    :param measurement_points: Nx2 的测量点像素坐标 [x, y] (整张地图的坐标)
+    :param y0: 区域左上角的y坐标 [pixel]
+    :param x0: 区域左上角的x坐标 [pixel]
+    :return: (h, w) 的uint8数组
+    """
+    height, width = grid.shape
+    layer = np.zeros((height, width), dtype=np.uint8)
+    ys = lattice.ys[(y0 <= lattice.ys) & (lattice.ys < y0 + height)]
+    xs = lattice.xs[(x0 <= lattice.xs) & (lattice.xs < x0 + width)]
+    layer[ys - y0, :] = 1
+    layer[:, xs - x0] = 1
+    layer[np.asarray(grid) > 1] = 2
+    _stamp(layer, [[lattice.origin_x_pixel - x0, lattice.origin_y_pixel - y0]], 3)
+    _stamp(layer, np.asarray(measurement_points, dtype=np.int64).reshape(-1, 2) - [x0, y0], 4)
+    return layer
+
+
+def _stamp(layer: np.ndarray, points, value: int):
+    """
+    以每个点为中心写入3x3的标记, 超出图像的部分被裁掉
+    """
+    points = np.asarray(points, dtype=np.int64).reshape(-1, 2)
+    offsets = np.arange(-1, 2)
+    xs = (points[:, 0, None, None] + offsets[None, None, :]).repeat(3, axis=1).ravel()
+    ys = (points[:, 1, None, None] + offsets[None, :, None]).repeat(3, axis=2).ravel()
+    inside = (0 <= xs) & (xs < layer.shape[1]) & (0 <= ys) & (ys < layer.shape[0])
+    layer[ys[inside], xs[inside]] = value
+
+
+class StaticOverlay:
+    """
+    网格线、障碍物、原点和测量点标记组成的静态图层
+    每张地图只计算一次, 之后每次重新着色只需一次按索引写入
+    """
+    GRID_LINE_COLOR = (50, 50, 50)  # 网格线
+    OBSTACLE_COLOR = (0, 0, 0)  # 障碍物
+    ORIGIN_COLOR = (0, 0, 255)  # 世界坐标系原点
+    MEASUREMENT_POINT_COLOR = (255, 0, 0)  # 测量点
+    PALETTE = np.array([
+        (0, 0, 0),
+        GRID_LINE_COLOR,
+        OBSTACLE_COLOR,
+        ORIGIN_COLOR,
+        MEASUREMENT_POINT_COLOR,
+    ], dtype=np.uint8)  # 各图层编号的BGR
+
+    def __init__(self, lattice: Lattice, grid: np.ndarray, measurement_points):
+        """
+        :param lattice: 测量点格网
+        :param grid: (height, width) 的地图数据, 大于1的格视为障碍物
+        :param measurement_points: Nx2 的测量点像素坐标 [x, y]
+        """
+        layer = overlay_layer(lattice, grid, measurement_points)
+        self.shape = layer.shape
+        self.index = np.flatnonzero(layer)  # 静态图层覆盖的像素(展平后的下标)
+        self.colors = self.PALETTE[layer.ravel()[self.index]]  # 对应的BGR
+
+    def apply(self, img: np.ndarray) -> np.ndarray:
+        """
+        将静态图层写入图像
+        :param img: (height, width, 3) 的uint8图像
+        :return: img
+        """
+        img.reshape(-1, 3)[self.index] = self.colors
+        return img
+
+
+class HeatmapCanvas:
+    """
+    缓存的热力图图像(热力层 + 静态图层), 可以只重绘部分格网单元
+    """
+
+    def __init__(
+            self,
+            lattice: Lattice,
+            overlay: StaticOverlay,
+            colormap: Colormap,
+            height_pixel: int,
+            width_pixel: int,
+            background=(150, 150, 150),
+            profiler=NULL_PROFILER,
+            image: np.ndarray = None,
+    ):
+        """
+        :param lattice: 测量点格网
+        :param overlay: 静态图层
+        :param colormap: 颜色映射
+        :param height_pixel: 图像高度 [pixel]
+        :param width_pixel: 图像宽度 [pixel]
+        :param background: 不着色单元的BGR
+        :param profiler: 分阶段计时('fill', 'overlay')
+        :param image: 重复使用的图像缓冲区(如上一张地图的图像), 尺寸不同时忽略
+        """
+        self.lattice = lattice
+        self.overlay = overlay
+        self.profiler = profiler
+        self.colormap = colormap
+        self.height_pixel = height_pixel
+        self.width_pixel = width_pixel
+        self.background = background
+        self.pixel_rows, self.pixel_cols = pixel_cell_index(lattice, height_pixel, width_pixel)
+        # 单元k覆盖的像素行为 [row_starts[k], row_starts[k + 1])
+        self.row_starts = np.searchsorted(self.pixel_rows, np.arange(lattice.shape[0] + 2))
+        self.col_starts = np.searchsorted(self.pixel_cols, np.arange(lattice.shape[1] + 2))
+        self.image = _reusable_image(image, height_pixel, width_pixel)  # 缓存的图像(重绘时写入同一个数组)
+        self._overlay_index = None  # 按格网单元排序的静态图层像素(展平后的下标)
+        self._overlay_colors = None  # 对应的BGR
+        self._overlay_cell_starts = None  # 单元c的静态图层像素为 [starts[c], starts[c + 1])
+
+    def render(self, cell_values: np.ndarray) -> np.ndarray:
+        """
+        重绘整张图像(写入缓存的图像, 之前返回的图像同样被更新)
+        :param cell_values: (ny + 1, nx + 1) 的单元值 (0~1), NaN表示不着色
+        :return: 缓存的图像
+        """
+        with self.profiler.stage('fill'):
+            if self.image is None:
+                self.image = np.empty((self.height_pixel, self.width_pixel, 3), dtype=np.uint8)
+            render_cells(
+                self.lattice,
+                cell_values,
+                self.colormap,
+                self.height_pixel,
+                self.width_pixel,
+                self.background,
+                self.image
+            )
+        with self.profiler.stage('overlay'):
+            return self.overlay.apply(self.image)
+
+    def update_cells(self, cell_rows: np.ndarray, cell_cols: np.ndarray, cell_values: np.ndarray) -> np.ndarray:
+        """
+        只重绘指定的格网单元(一次写入所有单元的像素, 再写入这些单元内的静态图层)
+        :param cell_rows: 单元行
+        :param cell_cols: 单元列
+        :param cell_values: 单元值 (0~1), NaN表示不着色
+        :return: 缓存的图像
+        """
+        if self._overlay_cell_starts is None:
+            self._index_overlay_by_cell()
+        cell_rows = np.asarray(cell_rows, dtype=np.intp)
+        cell_cols = np.asarray(cell_cols, dtype=np.intp)
+        colors = self.colormap(cell_values)
+        colors[np.isnan(cell_values)] = self.background
+
+        y0 = self.row_starts[cell_rows]
+        x0 = self.col_starts[cell_cols]
+        widths = self.col_starts[cell_cols + 1] - x0
+        sizes = (self.row_starts[cell_rows + 1] - y0) * widths
+        cell = np.repeat(np.arange(len(sizes)), sizes)  # 每个像素所属的单元(在本批中的序号)
+        dy, dx = np.divmod(_concat_ranges(np.zeros_like(sizes), sizes), widths[cell])  # 像素在单元内的位置
+        # 每个像素的BGR作为一个3字节的元素写入
+        pixels = self.image.reshape(-1, 3).view(_PIXEL).reshape(-1)
+        pixels[(y0 * self.width_pixel + x0)[cell] + dy * self.width_pixel + dx] = colors.view(_PIXEL).reshape(-1)[cell]
+
+        cells = cell_rows * (self.lattice.shape[1] + 1) + cell_cols
+        overlay = _concat_ranges(self._overlay_cell_starts[cells], self._overlay_cell_starts[cells + 1])
+        pixels[self._overlay_index[overlay]] = self._overlay_colors.view(_PIXEL).reshape(-1)[overlay]
+        return self.image
+
+    def _index_overlay_by_cell(self):
+        """
+        将静态图层的像素按所属格网单元排序, 之后每个单元的静态图层为一段连续的下标
+        """
+        index = self.overlay.index
+        cells = (
+                self.pixel_rows[index // self.width_pixel] * (self.lattice.shape[1] + 1)
+                + self.pixel_cols[index % self.width_pixel]
+        )
+        order = np.argsort(cells, kind='stable')
+        self._overlay_index = index[order]
+        self._overlay_colors = self.overlay.colors[order]
+        self._overlay_cell_starts = np.searchsorted(
+            cells[order],
+            np.arange((self.lattice.shape[0] + 1) * (self.lattice.shape[1] + 1) + 1)
+        )
+
+
+class InterpolatedCanvas:
+    """
+    插值渲染的热力图图像(热力层 + 静态图层), 只在空闲区域着色
+    """
+
+    def __init__(
+            self,
+            lattice: Lattice,
+            overlay: StaticOverlay,
+            colormap: Colormap,
+            engine: str,
+            free_mask: np.ndarray,
+            background=(150, 150, 150),
+            profiler=NULL_PROFILER,
+            image: np.ndarray = None,
+    ):
+        """
+        :param lattice: 测量点格网
+        :param overlay: 静态图层
+        :param colormap: 颜色映射
+        :param engine: INTERPOLATION_ENGINES 中的名称
+        :param free_mask: (height, width) 的空闲区域, 其他区域不着色
+        :param background: 不着色像素的BGR
+        :param profiler: 分阶段计时('fill', 'overlay')
+        :param image: 重复使用的图像缓冲区(如上一张地图的图像), 尺寸不同时忽略
+        """
+        if engine not in INTERPOLATION_ENGINES:
+            raise ValueError(f'未知的插值渲染引擎: {engine}')
+        self.lattice = lattice
+        self.overlay = overlay
+        self.colormap = colormap
+        self.engine = engine
+        self.free_mask = free_mask
+        self.background = background
+        self.profiler = profiler
+        self.image = _reusable_image(image, *free_mask.shape)  # 缓存的图像(重绘时写入同一个数组)
+
+    def render(self, node_values: np.ndarray) -> np.ndarray:
+        """
+        重绘整张图像(写入缓存的图像, 之前返回的图像同样被更新)
+        :param node_values: (ny, nx) 的格点值 (0~1), NaN表示没有测量值
+        :return: 缓存的图像
+        """
+        with self.profiler.stage('fill'):
+            height, width = self.free_mask.shape
+            pixel_values = interpolate_lattice(self.lattice, node_values, self.engine, height, width)
+            pixel_values[~self.free_mask] = np.nan
+            self.image = self.colormap(pixel_values, out=self.image)
+            self.image[np.isnan(pixel_values)] = self.background
+        with self.profiler.stage('overlay'):
+            return self.overlay.apply(self.image)
+
+
+def _reusable_image(image: np.ndarray, height_pixel: int, width_pixel: int):
+    """
+    :return: 尺寸为 (height, width, 3) 的uint8图像时返回image, 否则返回None
+    """
+    if image is not None and image.shape == (height_pixel, width_pixel, 3) and image.dtype == np.uint8:
+        return image
+    return None
+
+
+def _concat_ranges(starts: np.ndarray, stops: np.ndarray) -> np.ndarray:
+    """
+    :return: np.concatenate([np.arange(a, b) for a, b in zip(starts, stops)]) 的向量化版本
+    """
+    lengths = np.maximum(np.asarray(stops) - np.asarray(starts), 0)
+    total = int(lengths.sum())
+    if total == 0:
+        return np.empty(0, dtype=np.intp)
+    nonempty = lengths > 0
+    starts = np.asarray(starts)[nonempty]
+    lengths = lengths[nonempty]
+    # 每段第一个元素处的增量跳到该段的起点, 其余位置增量为1
+    steps = np.ones(total, dtype=np.intp)
+    heads = np.cumsum(lengths) - lengths
+    steps[0] = starts[0]
+    steps[heads[1:]] = starts[1:] - (starts[:-1] + lengths[:-1] - 1)
+    return np.cumsum(steps)
@@ -0,0 +1,212 @@
+"""
+分块处理超大地图: 地图按固定大小分块读取(每块外加机器人半径的边缘),
+逐块计算可通行性、测量点和热力图, 结果直接写入np.memmap或交给逐块的回调
+峰值内存由分块大小决定, 与地图尺寸无关(格网大小的数组除外, 为地图的 1/测量间隔² )
+"""
+import numpy as np
+
+from .HeatMapCreator import occupancy_data_to_grid
+from .clearance import compute_clearance_map
+from .colormap import get_colormap
+from .lattice import Lattice, node_cell_averages, select_measurement_points
+from .measurements import MeasurementGrid, brightness_range, normalize_brightness, snap_measurements
+from .profiling import NULL_PROFILER, StageProfiler
+from .rendering import StaticOverlay, overlay_layer, pixel_cell_index
+
+
+class TiledHeatMapCreator:
+    """
+    分块、内存有界的热力图生成, 结果与 HeatMapCreator(planner='lattice', neighbour_search='lattice') 相同
+    """
+
+    def __init__(
+            self,
+            heat_map_interval: float,
+            robot_radius: float = 0.16,
+            tile_size: int = 2048,
+            connectivity: str = 'lattice',
+            colormap='blue_green_red',
+            profile_sink=None,
+    ):
+        """
+        :param heat_map_interval: 热力图的测量间隔 [m]
+        :param robot_radius: 机器人半径 [m]
+        :param tile_size: 分块大小 [pixel]
+        :param connectivity: 连通方式 'lattice': 与BFS相同 / 'free': 只保留经由可用格点与原点连通的点
+        :param colormap: 颜色映射 内置名称 / Colormap / BGR控制色列表
+        :param profile_sink: 分阶段计时和计数的输出, 见 HeatMapCreator
+        """
+        if connectivity not in ('lattice', 'free'):
+            raise ValueError(f'未知的连通方式: {connectivity}')
+        if tile_size <= 0:
+            raise ValueError(f'分块大小必须大于0 [pixel]: {tile_size}')
+        self.heat_map_interval = heat_map_interval  # 热力图的测量间隔 [m]
+        self.heat_map_interval_pixel = 0  # 热力图的测量间隔 [pixel]
+        self.robot_radius = robot_radius  # 机器人半径 [m]
+        self.robot_radius_pixel = 0  # 机器人半径 [pixel]
+        self.tile_size = tile_size  # 分块大小 [pixel]
+        self.connectivity = connectivity  # 连通方式
+        self.colormap = get_colormap(colormap)  # 颜色映射(查找表)
+        self.background = (150, 150, 150)  # 不着色单元的BGR
+
+        self.grid = None  # (height, width) 的地图数据(原始数据的翻转视图, 不读入内存)
+        self.raw_grid_map_width_pixel = 0  # 原始地图的宽度 [pixel]
+        self.raw_grid_map_height_pixel = 0  # 原始地图的高度 [pixel]
+        self.raw_grid_map_resolution = 0  # 原始地图的分辨率 [m/pixel]
+
+        self.lattice = None  # 测量点格网
+        self._node_clearance = None  # 格点处的可通行性
+        self._lattice_available = None  # 格网上的可用格点
+        self.available_measurement_points = np.empty((0, 2), dtype=np.int64)  # 实际可用测量点坐标 [pixel]
+        self.available_measurement_points_world = np.empty((0, 2))  # 世界坐标系中实际可用测量点坐标 [m]
+        self.measurements = None  # 各测量点的测量值统计
+
+        self.profiler = NULL_PROFILER if profile_sink is None else StageProfiler(profile_sink)  # 分阶段计时
+
+    def map_callback(
+            self,
+            raw_grid_map_data,
+            raw_grid_map_width_pixel: int,
+            raw_grid_map_height_pixel: int,
+            raw_grid_map_resolution: float,
+            raw_grid_map_origin_x: float,
+            raw_grid_map_origin_y: float,
+    ):
+        """
+        读入地图并逐块计算可用测量点, 参数同 HeatMapCreator.map_callback
+        raw_grid_map_data 可以是 np.memmap (如 iter_replay_cache 的结果), 只按块读取
+        :return:
+        """
+        self.grid = occupancy_data_to_grid(raw_grid_map_data, raw_grid_map_width_pixel, raw_grid_map_height_pixel)
+        self.raw_grid_map_width_pixel = raw_grid_map_width_pixel
+        self.raw_grid_map_height_pixel = raw_grid_map_height_pixel
+        self.raw_grid_map_resolution = raw_grid_map_resolution
+        self.heat_map_interval_pixel = int(self.heat_map_interval / raw_grid_map_resolution)
+        self.robot_radius_pixel = int(self.robot_radius / raw_grid_map_resolution)
+        origin_x_pixel = int(raw_grid_map_origin_x / raw_grid_map_resolution)
+        origin_y_pixel = int(raw_grid_map_origin_y / raw_grid_map_resolution)
+        self.lattice = Lattice(
+            -origin_x_pixel,
+            raw_grid_map_height_pixel - 1 - -origin_y_pixel,
+            self.heat_map_interval_pixel,
+            raw_grid_map_width_pixel,
+            raw_grid_map_height_pixel
+        )
+        self.measurements = MeasurementGrid(self.lattice)
+
+        with self.profiler.stage('explore'):
+            self._node_clearance = np.zeros(self.lattice.shape, dtype=bool)
+            for y0, y1, x0, x1 in self.tiles():
+                with self.profiler.stage('footprint_check'):
+                    rows, cols = self._tile_nodes(y0, y1, x0, x1)
+                    if rows.size == 0 or cols.size == 0:
+                        continue
+                    clearance_map, wy0, wx0 = self._tile_clearance(y0, y1, x0, x1)
+                    self._node_clearance[np.ix_(rows, cols)] = clearance_map[
+                        np.ix_(self.lattice.ys[rows] - wy0, self.lattice.xs[cols] - wx0)
+                    ]
+            self.profiler.count('candidates_visited', self._node_clearance.size - int(self.lattice.contains_origin()))
+            self._lattice_available = select_measurement_points(self.lattice, self._node_clearance, self.connectivity)
+            points = self.lattice.node_pixels(*np.nonzero(self._lattice_available))
+            self.available_measurement_points = points
+            with self.profiler.stage('world_conversion'):
+                self.available_measurement_points_world = self.lattice.pixels_to_world(points, raw_grid_map_resolution)
+        self.profiler.count('points_accepted', len(points))
+
+    def tiles(self):
+        """
+        :return: 各分块 (y0, y1, x0, x1) 的生成器, 按行优先顺序
+        """
+        for y0 in range(0, self.raw_grid_map_height_pixel, self.tile_size):
+            for x0 in range(0, self.raw_grid_map_width_pixel, self.tile_size):
+                yield (
+                    y0,
+                    min(y0 + self.tile_size, self.raw_grid_map_height_pixel),
+                    x0,
+                    min(x0 + self.tile_size, self.raw_grid_map_width_pixel)
+                )
+
+    def _tile_nodes(self, y0: int, y1: int, x0: int, x1: int):
+        """
+        :return: 分块内格点的 (格网行, 格网列)
+        """
+        rows = np.flatnonzero((y0 <= self.lattice.ys) & (self.lattice.ys < y1))
+        cols = np.flatnonzero((x0 <= self.lattice.xs) & (self.lattice.xs < x1))
+        return rows, cols
+
+    def _tile_clearance(self, y0: int, y1: int, x0: int, x1: int):
+        """
+        读取分块及其外围机器人半径范围内的地图, 计算可通行地图
+        占地范围为 [-r, r-1], 外加r格后分块内的结果与整图计算一致
+        :return: (可通行地图, 读取区域的y0, 读取区域的x0)
+        """
+        r = self.robot_radius_pixel
+        wy0 = max(y0 - r, 0)
+        wx0 = max(x0 - r, 0)
+        window = np.array(self.grid[wy0:min(y1 + r, self.raw_grid_map_height_pixel), wx0:min(x1 + r, self.raw_grid_map_width_pixel)])
+        return compute_clearance_map(window, r), wy0, wx0
+
+    def add_measurements(self, points, values) -> int:
+        """
+        添加一批测量值，吸附到最近的格点并累计统计
+        :param points: Nx2 的世界坐标 [m]
+        :param values: N 个测量值
+        :return: 被采用的测量值个数(最近的格点不是可用测量点的测量值被丢弃)
+        """
+        rows, cols, values = snap_measurements(
+            self.lattice,
+            self._lattice_available,
+            self.raw_grid_map_resolution,
+            points,
+            values
+        )
+        if rows.size:
+            self.measurements.add(rows, cols, values)
+        return int(rows.size)
+
+    def heatmap_callback(self, output=None, on_tile=None):
+        """
+        逐块生成亮度热力图
+        :param output: None: 不保存整张图 / 文件路径: 写入该.npy文件(np.memmap) / (height, width, 3) 的uint8数组
+        :param on_tile: 每块完成后调用 on_tile(y0, x0, tile_img), 可用于写入分块图像文件
+        :return: output对应的数组, output为None时返回None
+        """
+        if isinstance(output, str):
+            output = np.lib.format.open_memmap(
+                output,
+                mode='w+',
+                dtype=np.uint8,
+                shape=(self.raw_grid_map_height_pixel, self.raw_grid_map_width_pixel, 3)
+            )
+
+        # 归一化和格网单元的值只与格网大小有关
+        node_brightness = self.measurements.brightness(self._lattice_available)
+        cell_values = normalize_brightness(node_cell_averages(node_brightness), *brightness_range(node_brightness))
+        cell_colors = self.colormap(cell_values)
+        cell_colors[np.isnan(cell_values)] = self.background
+        pixel_rows, pixel_cols = pixel_cell_index(self.lattice, self.raw_grid_map_height_pixel, self.raw_grid_map_width_pixel)
+
+        for y0, y1, x0, x1 in self.tiles():
+            with self.profiler.stage('fill'):
+                tile_img = cell_colors[pixel_rows[y0:y1, None], pixel_cols[None, x0:x1]]
+            with self.profiler.stage('overlay'):
+                # 测量点标记为3x3, 分块外1格内的测量点也会画到分块内
+                rows, cols = self._tile_nodes(y0 - 1, y1 + 1, x0 - 1, x1 + 1)
+                available = self._lattice_available[np.ix_(rows, cols)]
+                node_rows, node_cols = np.nonzero(available)
+                layer = overlay_layer(
+                    self.lattice,
+                    self.grid[y0:y1, x0:x1],
+                    self.lattice.node_pixels(rows[node_rows], cols[node_cols]),
+                    y0,
+                    x0
+                )
+                covered = layer > 0
+                tile_img[covered] = StaticOverlay.PALETTE[layer[covered]]
+            if output is not None:
+                output[y0:y1, x0:x1] = tile_img
+            if on_tile is not None:
+                on_tile(y0, x0, tile_img)
+        if isinstance(output, np.memmap):
+            output.flush()
+        return output
@@ -0,0 +1,26 @@
+import pytest
+
+from benchmark import generate_occupancy_grid
+from src.map_loader import iter_occupancy_grids
+from tests.helpers import MAP_DATA_PATH
+
+
+@pytest.fixture(scope='session')
+def recorded_frame():
+    """
+    map_data.txt 中的第一条/map消息
+    """
+    return next(iter_occupancy_grids(MAP_DATA_PATH))
+
+
+@pytest.fixture(scope='session')
+def synthetic_frame():
+    """
+    带房间、门和零散障碍物的合成地图
+    """
+    return generate_occupancy_grid(240, 200, obstacle_density=0.002, seed=3)
+
+
+@pytest.fixture(params=['recorded', 'synthetic'])
+def frame(request, recorded_frame, synthetic_frame):
+    return recorded_frame if request.param == 'recorded' else synthetic_frame
@@ -0,0 +1,37 @@
+import os
+
+import numpy as np
+
+from benchmark import synthetic_measurements
+from src.HeatMapCreator import HeatMapCreator
+
+MAP_DATA_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'map_data.txt')  # 录制的/map消息
+
+
+def make_creator(frame, heat_map_interval: float, robot_radius: float = 0.16, **options) -> HeatMapCreator:
+    """
+    :return: 已读入frame并生成测量点的 HeatMapCreator
+    """
+    creator = HeatMapCreator(heat_map_interval, **options)
+    creator.robot_radius = robot_radius
+    creator.map_callback(*frame[:6])
+    return creator
+
+
+def point_set(points) -> set:
+    """
+    :param points: Nx2 的坐标, 或带 available_measurement_points 的对象
+    :return: 坐标 [pixel] 的集合
+    """
+    points = getattr(points, 'available_measurement_points', points)
+    return set(map(tuple, np.asarray(points, dtype=np.int64).reshape(-1, 2).tolist()))
+
+
+def measure_all(creator) -> np.ndarray:
+    """
+    给所有可用测量点添加可复现的测量值
+    :return: 测量点的世界坐标 [m]
+    """
+    points_world = np.asarray(creator.available_measurement_points_world, dtype=np.float64).reshape(-1, 2)
+    creator.add_measurements(points_world, synthetic_measurements(points_world))
+    return points_world
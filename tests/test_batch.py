@@ -0,0 +1,75 @@
+import numpy as np
+import pytest
+
+from src import batch, clearance
+from src.batch import BatchJob, iter_jobs, make_jobs, run_batch
+from tests.helpers import make_creator, point_set
+
+
+@pytest.fixture
+def frames(synthetic_frame, recorded_frame):
+    return {'synthetic': synthetic_frame, 'recorded': recorded_frame}
+
+
+def test_iter_jobs_is_lazy_and_grouped(frames):
+    jobs = iter_jobs(iter(frames.items()), [0.3, 0.5], [0.16])
+    assert not isinstance(jobs, list)
+    jobs = list(jobs)
+    assert [job.job_id for job in jobs] == [
+        'synthetic_i0.3_r0.16', 'synthetic_i0.5_r0.16', 'recorded_i0.3_r0.16', 'recorded_i0.5_r0.16'
+    ]
+    assert make_jobs([frames['recorded']], [0.5], [0.16, 0.2])[1].job_id == 'map00000_i0.5_r0.2'
+
+
+def test_run_batch_matches_single_process(frames):
+    measurements = {}
+    for name, frame in frames.items():
+        points_world = np.asarray(make_creator(frame, 0.5, ingest_mode='view', planner='lattice').available_measurement_points_world)
+        measurements[name] = (points_world, np.linspace(0.0, 1.0, len(points_world)))
+    jobs = make_jobs(frames, [0.3, 0.5], [0.16, 0.2], measurements=measurements)
+    jobs.append(BatchJob('broken', frames['synthetic'], 0.5, 0.16, dict(planner='unknown')))
+
+    results = {result.job_id: result for result in run_batch(iter(jobs), processes=2, max_maps_in_flight=1)}
+    assert len(results) == len(jobs)
+    assert results['broken'].error.startswith('ValueError')
+    for job in jobs[:-1]:
+        result = results[job.job_id]
+        assert result.error is None, result.error
+        reference = make_creator(job.frame, job.heat_map_interval, job.robot_radius, ingest_mode='view', planner='lattice')
+        assert point_set(result.points) == point_set(reference)
+        reference.add_measurements(*job.measurements)
+        cv2 = pytest.importorskip('cv2')
+        image = cv2.imdecode(np.frombuffer(result.png, dtype=np.uint8), cv2.IMREAD_COLOR)
+        assert np.array_equal(image, reference.heatmap_callback())
+
+
+def test_worker_reuses_clearance_map(synthetic_frame, monkeypatch):
+    calls = []
+    compute_clearance_map = clearance.compute_clearance_map
+
+    def counting(grid, robot_radius_pixel):
+        calls.append(robot_radius_pixel)
+        return compute_clearance_map(grid, robot_radius_pixel)
+
+    monkeypatch.setattr(clearance, 'compute_clearance_map', counting)
+    segment = batch._create_segment(synthetic_frame)
+    try:
+        meta = tuple(synthetic_frame[1:6])
+        sweep = ((0.3, 0.16), (0.5, 0.16), (0.4, 0.2), (0.2, 0.16))
+        results = [
+            batch._run_job(('job', segment.name, meta, interval, radius, dict(batch.DEFAULT_OPTIONS), None, False))
+            for interval, radius in sweep
+        ]
+        # 同一张地图每个机器人半径只计算一次整图的可通行地图
+        assert sorted(calls) == sorted({int(radius / synthetic_frame.resolution) for _, radius in sweep})
+        for (interval, radius), result in zip(sweep, results):
+            assert result.error is None, result.error
+            reference = make_creator(synthetic_frame, interval, radius, ingest_mode='view', planner='lattice')
+            assert point_set(result.points) == point_set(reference)
+    finally:
+        batch._worker_clearance.clear()
+        if batch._worker_segment is not None:
+            batch._worker_segment.close()
+            batch._worker_segment = None
+        segment.close()
+        segment.unlink()
@@ -0,0 +1,42 @@
+import numpy as np
+import pytest
+
+from src.colormap import Colormap, get_colormap, value_to_color
+
+
+def test_builtin_matches_value_to_color():
+    colormap = get_colormap('blue_green_red')
+    values = np.linspace(0.0, 1.0, len(colormap))
+    expected = np.array([value_to_color(v) for v in values]).clip(0, 255).astype(np.uint8)
+    assert np.array_equal(colormap(values), expected)
+    assert get_colormap('blue_green_red') is colormap
+
+
+def test_out_of_range_and_nan():
+    colormap = get_colormap('gray')
+    values = np.array([-1.0, 0.0, np.nan, 1.0, 2.0])
+    assert np.array_equal(colormap(values)[:, 0], [0, 0, 0, 255, 255])
+
+
+def test_from_colors_interpolates():
+    colormap = Colormap.from_colors([(0, 0, 0), (100, 200, 50), (200, 0, 250)], size=5)
+    assert np.array_equal(colormap.lut, [(0, 0, 0), (50, 100, 25), (100, 200, 50), (150, 100, 150), (200, 0, 250)])
+    assert get_colormap([(0, 0, 0), (255, 255, 255)])(0.5).tolist() == [127, 127, 127]
+
+
+def test_out_array():
+    colormap = get_colormap('gray')
+    out = np.zeros((2, 3, 3), dtype=np.uint8)
+    assert colormap(np.full((2, 3), 1.0), out=out) is out
+    assert np.all(out == 255)
+
+
+@pytest.mark.parametrize('lut', [[(0, 0, 0)], [(0, 0), (1, 1)]])
+def test_invalid_lut(lut):
+    with pytest.raises(ValueError):
+        Colormap(lut)
+
+
+def test_unknown_builtin():
+    with pytest.raises(ValueError):
+        get_colormap('rainbow')
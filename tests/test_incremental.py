@@ -0,0 +1,51 @@
+import numpy as np
+import pytest
+
+from src.HeatMapCreator import HeatMapCreator
+from src.map_loader import OccupancyGridFrame
+from tests.helpers import make_creator, measure_all, point_set
+
+
+def _edit(frame, rng, edits: int) -> OccupancyGridFrame:
+    """
+    :return: 在随机矩形区域写入空闲/障碍物/未知后的新地图
+    """
+    grid = np.array(frame.data, dtype=np.int8).reshape(frame.height, frame.width)
+    for _ in range(edits):
+        y = int(rng.integers(0, frame.height - 30))
+        x = int(rng.integers(0, frame.width - 30))
+        grid[y:y + int(rng.integers(1, 30)), x:x + int(rng.integers(1, 30))] = rng.choice([0, 100, -1])
+    return frame._replace(data=grid.reshape(-1))
+
+
+@pytest.mark.parametrize('connectivity', ['lattice', 'free'])
+def test_incremental_matches_full_recompute(synthetic_frame, connectivity):
+    rng = np.random.default_rng(0)
+    options = dict(ingest_mode='view', planner='lattice', connectivity=connectivity)
+    incremental = make_creator(synthetic_frame, 0.3, 0.2, incremental=True, **options)
+    current = synthetic_frame
+    for step in range(6):
+        previous = point_set(incremental)
+        if step != 2:  # 第3次为相同的地图
+            current = _edit(current, rng, int(rng.integers(1, 6)))
+        incremental.map_callback(*current[:6])
+        full = make_creator(current, 0.3, 0.2, **options)
+
+        points = point_set(incremental)
+        assert points == point_set(full)
+        assert point_set(incremental.added_measurement_points) == points - previous
+        assert point_set(incremental.removed_measurement_points) == previous - points
+        if step == 2:
+            assert incremental.dirty_tile_count == 0
+        assert np.array_equal(incremental.clearance_index.clearance_map, full.clearance_index.clearance_map)
+
+        measure_all(incremental)
+        measure_all(full)
+        assert np.array_equal(incremental.heatmap_callback(), full.heatmap_callback())
+
+
+def test_incremental_requires_view_and_lattice():
+    with pytest.raises(ValueError):
+        HeatMapCreator(0.3, planner='lattice', incremental=True)
+    with pytest.raises(ValueError):
+        HeatMapCreator(0.3, ingest_mode='view', incremental=True)
@@ -0,0 +1,23 @@
+import numpy as np
+import pytest
+
+from tests.helpers import make_creator, point_set
+
+
+@pytest.mark.parametrize('ingest_mode', ['legacy', 'view'])
+def test_measurement_point_mask(recorded_frame, ingest_mode):
+    creator = make_creator(recorded_frame, 0.3, 0.25, ingest_mode=ingest_mode)
+    ys, xs = np.nonzero(creator.measurement_point_mask)
+    assert point_set(np.stack([xs, ys], axis=1)) == point_set(creator)
+    if ingest_mode == 'legacy':
+        # 原始实现在地图上标记测量点(探索结束后)
+        assert np.array_equal(creator.raw_grid_map_data_2d[0] == 1, creator.measurement_point_mask)
+    else:
+        # 零拷贝视图不修改地图
+        assert not np.any(creator.raw_grid_map_data_2d[0] == 1)
+
+
+def test_view_is_zero_copy(recorded_frame):
+    data = np.asarray(recorded_frame.data, dtype=np.int8)
+    creator = make_creator(recorded_frame._replace(data=data), 0.5, ingest_mode='view')
+    assert np.shares_memory(creator.raw_grid_map_data_2d[0], data)
@@ -0,0 +1,65 @@
+import numpy as np
+import pytest
+
+from src.HeatMapCreator import HeatMapCreator
+from src.lattice import Lattice
+from src.rendering import INTERPOLATION_ENGINES, interpolate_lattice
+
+
+def _interpolate_reference(lattice, node_values, engine, height, width):
+    """
+    逐像素对所有有测量值的格点加权平均
+    """
+    _, weight_function = INTERPOLATION_ENGINES[engine]
+    rows, cols = np.nonzero(~np.isnan(node_values))
+    ys = lattice.ys[rows]
+    xs = lattice.xs[cols]
+    result = np.full((height, width), np.nan)
+    for y in range(height):
+        for x in range(width):
+            weights = weight_function(ys - y, xs - x, lattice.interval_pixel)
+            if weights.sum() > 0:
+                result[y, x] = (weights * node_values[rows, cols]).sum() / weights.sum()
+    return result
+
+
+@pytest.mark.parametrize('engine', list(INTERPOLATION_ENGINES))
+def test_matches_per_pixel_reference(engine):
+    lattice = Lattice(7, 9, 4, 30, 25)
+    rng = np.random.default_rng(0)
+    node_values = rng.random(lattice.shape)
+    node_values[rng.random(lattice.shape) < 0.3] = np.nan
+    result = interpolate_lattice(lattice, node_values, engine, 25, 30)
+    expected = _interpolate_reference(lattice, node_values, engine, 25, 30)
+    assert np.array_equal(np.isnan(result), np.isnan(expected))
+    assert np.allclose(result[~np.isnan(result)], expected[~np.isnan(expected)], atol=1e-5)
+
+
+@pytest.mark.parametrize('engine', list(INTERPOLATION_ENGINES))
+def test_exact_at_nodes_and_constant_fields(engine):
+    lattice = Lattice(3, 5, 5, 40, 32)
+    rng = np.random.default_rng(1)
+    node_values = rng.random(lattice.shape)
+    result = interpolate_lattice(lattice, node_values, engine, 32, 40)
+    assert np.allclose(result[np.ix_(lattice.ys, lattice.xs)], node_values, atol=1e-3)
+    constant = interpolate_lattice(lattice, np.full(lattice.shape, 0.25), engine, 32, 40)
+    assert np.allclose(constant[~np.isnan(constant)], 0.25)
+
+
+def test_only_free_pixels_are_coloured(recorded_frame):
+    creator = HeatMapCreator(0.3, ingest_mode='view', planner='lattice', render_engine='bilinear')
+    creator.map_callback(*recorded_frame[:6])
+    points_world = np.asarray(creator.available_measurement_points_world)
+    creator.add_measurements(points_world, np.linspace(0.0, 1.0, len(points_world)))
+    image = creator.heatmap_callback()
+    grid = creator.raw_grid_map_data_2d[0]
+    uncovered = (grid != 0) & (grid != 1)
+    uncovered.reshape(-1)[creator.static_overlay.index] = False
+    assert uncovered.any()
+    assert np.all(image[uncovered] == creator.heatmap_canvas.background)
+
+
+@pytest.mark.parametrize('options', [dict(render_engine='cubic'), dict(render_engine='idw', neighbour_search='tolerance')])
+def test_invalid_engine_options(options):
+    with pytest.raises(ValueError):
+        HeatMapCreator(0.3, **options)
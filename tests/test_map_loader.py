@@ -0,0 +1,91 @@
+import os
+
+import numpy as np
+
+from src.map_loader import (
+    build_replay_cache,
+    is_cache_fresh,
+    iter_occupancy_grid_dump,
+    iter_occupancy_grids,
+    replay_cache_dir,
+)
+from tests.helpers import MAP_DATA_PATH
+
+
+def _write_dump(path, width: int, height: int, value: int = 0):
+    """
+    写入只有一条消息的转储文件, 格式与 map_data.txt 相同
+    """
+    data = ', '.join([str(value)] * (width * height))
+    with open(path, 'w') as f:
+        f.write(
+            '=== OccupancyGrid Message ===\n'
+            "header: std_msgs.msg.Header(stamp=builtin_interfaces.msg.Time(sec=1, nanosec=2), frame_id='map')\n"
+            f'info: width={width}, height={height}, resolution=0.05000000074505806, '
+            'origin=geometry_msgs.msg.Pose(position=geometry_msgs.msg.Point(x=-1.0, y=-2.0, z=0.0))\n'
+            f'data: (length={width * height})\n'
+            f"array('b', [{data}])\n"
+        )
+
+
+def test_parse_dump():
+    frames = list(iter_occupancy_grid_dump(MAP_DATA_PATH))
+    assert len(frames) == 2
+    frame = frames[0]
+    assert (frame.width, frame.height, frame.resolution) == (203, 317, 0.05)
+    assert frame.data.dtype == np.int8 and frame.data.size == 203 * 317
+    assert frame.frame_id == 'map'
+
+
+def test_cache_round_trip(tmp_path):
+    cache_dir = str(tmp_path / 'cache')
+    expected = list(iter_occupancy_grid_dump(MAP_DATA_PATH))
+    assert not is_cache_fresh(MAP_DATA_PATH, cache_dir)
+    list(iter_occupancy_grids(MAP_DATA_PATH, cache_dir))  # 第一次读取时生成缓存
+    assert is_cache_fresh(MAP_DATA_PATH, cache_dir)
+    for mmap in (True, False):
+        frames = list(iter_occupancy_grids(MAP_DATA_PATH, cache_dir, mmap=mmap))
+        assert len(frames) == len(expected)
+        for frame, reference in zip(frames, expected):
+            assert isinstance(frame.data, np.memmap) == mmap
+            assert np.array_equal(frame.data, reference.data)
+            assert frame[1:] == reference[1:]
+
+
+def test_cache_from_other_dump_is_rebuilt(tmp_path):
+    first = str(tmp_path / 'a' / 'map.txt')
+    second = str(tmp_path / 'b' / 'map.txt')
+    os.makedirs(os.path.dirname(first))
+    os.makedirs(os.path.dirname(second))
+    _write_dump(first, 4, 3)
+    _write_dump(second, 5, 2, 100)
+    cache_dir = str(tmp_path / 'cache')
+    build_replay_cache(first, cache_dir)
+    # 缓存比第二个转储文件新, 但不是由它生成的
+    os.utime(second, ns=(0, 0))
+    assert not is_cache_fresh(second, cache_dir)
+    frame, = iter_occupancy_grids(second, cache_dir)
+    assert (frame.width, frame.height) == (5, 2)
+    assert np.all(frame.data == 100)
+
+
+def test_cache_invalidated_by_size_or_mtime(tmp_path):
+    dump = str(tmp_path / 'map.txt')
+    cache_dir = str(tmp_path / 'cache')
+    _write_dump(dump, 4, 3)
+    build_replay_cache(dump, cache_dir)
+    assert is_cache_fresh(dump, cache_dir)
+    stat = os.stat(dump)
+    os.utime(dump, ns=(stat.st_atime_ns, stat.st_mtime_ns - 10 ** 9))
+    assert not is_cache_fresh(dump, cache_dir)
+    _write_dump(dump, 6, 3)
+    os.utime(dump, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+    assert not is_cache_fresh(dump, cache_dir)
+
+
+def test_replay_cache_dir_distinguishes_paths(tmp_path):
+    first = replay_cache_dir('cache', str(tmp_path / 'a' / 'map.txt'))
+    second = replay_cache_dir('cache', str(tmp_path / 'b' / 'map.txt'))
+    assert first != second
+    assert os.path.basename(first).startswith('map_')
+    assert replay_cache_dir('cache', str(tmp_path / 'a' / 'map.txt')) == first
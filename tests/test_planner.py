@@ -0,0 +1,52 @@
+import numpy as np
+import pytest
+
+from src.lattice import flood_fill
+from tests.helpers import make_creator, point_set
+
+# (测量间隔, 机器人半径) [m], 地图分辨率0.05m/pixel
+# 占地范围为 [-r, r-1], interval_pixel <= robot_radius_pixel 时已采用的测量点落在相邻格点的占地范围内,
+# 原始BFS把它当作障碍物; 0.3m 截断后为5px, (0.3, 0.25) 即 5px <= 5px
+INTERVALS_AND_RADII = [(0.5, 0.16), (0.3, 0.16), (0.3, 0.25), (0.1, 0.25)]
+
+
+@pytest.mark.parametrize('heat_map_interval, robot_radius', INTERVALS_AND_RADII)
+def test_planners_agree(frame, heat_map_interval, robot_radius):
+    reference = point_set(make_creator(frame, heat_map_interval, robot_radius))
+    assert reference
+    for options in (
+            dict(ingest_mode='view'),
+            dict(use_clearance_index=True),
+            dict(ingest_mode='view', use_clearance_index=True),
+            dict(planner='lattice'),
+            dict(ingest_mode='view', planner='lattice'),
+    ):
+        assert point_set(make_creator(frame, heat_map_interval, robot_radius, **options)) == reference, options
+
+
+def test_free_connectivity_is_subset(frame):
+    points = point_set(make_creator(frame, 0.3, 0.16, planner='lattice'))
+    connected = point_set(make_creator(frame, 0.3, 0.16, planner='lattice', connectivity='free'))
+    assert connected and connected <= points
+
+
+def _flood_fill_reference(mask, seed):
+    filled = np.zeros_like(mask)
+    stack = [seed]
+    while stack:
+        y, x = stack.pop()
+        if filled[y, x]:
+            continue
+        filled[y, x] = True
+        for ny, nx in ((y - 1, x), (y + 1, x), (y, x - 1), (y, x + 1)):
+            if 0 <= ny < mask.shape[0] and 0 <= nx < mask.shape[1] and mask[ny, nx] and not filled[ny, nx]:
+                stack.append((ny, nx))
+    return filled & mask
+
+
+@pytest.mark.parametrize('seed', range(5))
+def test_flood_fill(seed):
+    rng = np.random.default_rng(seed)
+    mask = rng.random((40, 60)) < 0.6
+    start = (int(rng.integers(40)), int(rng.integers(60)))
+    assert np.array_equal(flood_fill(mask, start), _flood_fill_reference(mask, start))
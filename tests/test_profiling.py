@@ -0,0 +1,75 @@
+import logging
+
+import pytest
+
+from src.profiling import NULL_PROFILER, CallbackSink, InMemoryStats, LoggerSink, StageProfiler, make_sink
+from tests.helpers import make_creator, measure_all, point_set
+
+
+def test_in_memory_stats():
+    stats = InMemoryStats()
+    profiler = StageProfiler(stats)
+    for _ in range(3):
+        with profiler.stage('explore'):
+            pass
+    profiler.record_time('fill', 0.002)
+    profiler.record_time('fill', 0.004)
+    profiler.count('points_accepted', 5)
+    profiler.count('points_accepted')
+    assert stats.timings['explore']['calls'] == 3
+    assert stats.timings['fill'] == pytest.approx({'calls': 2, 'total': 0.006, 'min': 0.002, 'max': 0.004, 'last': 0.004})
+    assert stats.counters == {'points_accepted': 6}
+    assert 'fill: 3.000ms x2' in stats.summary().splitlines()
+    stats.reset()
+    assert stats.timings == {} and stats.counters == {}
+
+
+def test_stage_recorded_on_error():
+    stats = InMemoryStats()
+    with pytest.raises(RuntimeError):
+        with StageProfiler(stats).stage('explore'):
+            raise RuntimeError
+    assert stats.timings['explore']['calls'] == 1
+
+
+def test_make_sink(caplog):
+    stats = InMemoryStats()
+    assert make_sink(stats) is stats
+    assert isinstance(make_sink(logging.getLogger('heatmap')), LoggerSink)
+    events = []
+    sink = make_sink(lambda *event: events.append(event))
+    assert isinstance(sink, CallbackSink)
+    sink.record_count('points_accepted', 3)
+    assert events == [('count', 'points_accepted', 3)]
+    with pytest.raises(TypeError):
+        make_sink(42)
+
+    with caplog.at_level(logging.DEBUG, logger='heatmap'):
+        StageProfiler(logging.getLogger('heatmap')).count('candidates_visited', 7)
+    assert caplog.messages == ['candidates_visited: 7']
+
+
+@pytest.mark.parametrize('planner', ['bfs', 'lattice'])
+def test_creator_stages(recorded_frame, planner):
+    stats = InMemoryStats()
+    creator = make_creator(recorded_frame, 0.5, planner=planner, profile_sink=stats)
+    measure_all(creator)
+    creator.heatmap_callback()
+    for stage in ('ingest', 'flip', 'explore', 'footprint_check', 'world_conversion', 'measure', 'heatmap', 'fill', 'overlay'):
+        assert stage in stats.timings, stage
+    assert stats.counters['points_accepted'] == len(point_set(creator))
+    assert stats.counters['candidates_visited'] >= stats.counters['points_accepted']
+
+
+def test_profiling_off_by_default(recorded_frame, capsys):
+    creator = make_creator(recorded_frame, 0.5)
+    assert creator.profiler is NULL_PROFILER
+    assert capsys.readouterr().out == ''
+
+
+def test_debug_level(recorded_frame, capsys):
+    creator = make_creator(recorded_frame, 0.5, debug_level=1)
+    lines = capsys.readouterr().out.splitlines()
+    assert lines[-1] == f'{len(creator.available_measurement_points_world)}个测量点'
+    make_creator(recorded_frame, 0.5, debug_level=2)
+    assert len(capsys.readouterr().out.splitlines()) > len(lines)
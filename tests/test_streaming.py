@@ -0,0 +1,41 @@
+import numpy as np
+import pytest
+
+from src.rendering import _concat_ranges
+from tests.helpers import make_creator
+
+
+def test_concat_ranges():
+    rng = np.random.default_rng(0)
+    starts = rng.integers(0, 50, 30)
+    stops = starts + rng.integers(-3, 6, 30)
+    expected = np.concatenate([np.arange(a, b) for a, b in zip(starts, stops)])
+    assert np.array_equal(_concat_ranges(starts, stops), expected)
+    assert _concat_ranges(np.array([3]), np.array([3])).size == 0
+
+
+@pytest.mark.parametrize('render_engine', ['quadrant', 'bilinear', 'idw'])
+def test_streaming_matches_full_render(frame, render_engine):
+    options = dict(ingest_mode='view', planner='lattice', render_engine=render_engine)
+    streaming = make_creator(frame, 0.3, 0.16, **options)
+    reference = make_creator(frame, 0.3, 0.16, **options)
+    points_world = np.asarray(streaming.available_measurement_points_world)
+    # 之后的add_measurements都应更新这张图像
+    img = streaming.heatmap_callback()
+
+    rng = np.random.default_rng(1)
+    for step in range(25):
+        n = int(rng.integers(1, 5))
+        points = points_world[rng.integers(0, len(points_world), n)] + rng.uniform(-0.1, 0.1, (n, 2))
+        # 部分批次超出当前的归一化范围, 覆盖整图重绘的分支
+        values = rng.uniform(-0.5, 1.5, n) if step % 7 == 3 else rng.random(n)
+        assert streaming.add_measurements(points, values) == reference.add_measurements(points, values)
+        assert np.array_equal(img, reference.heatmap_callback()), step
+    assert streaming.heatmap_callback() is img
+
+
+def test_image_reused_across_maps(synthetic_frame):
+    creator = make_creator(synthetic_frame, 0.5, 0.16, ingest_mode='view', planner='lattice')
+    img = creator.heatmap_callback()
+    creator.map_callback(*synthetic_frame[:6])
+    assert creator.heatmap_callback() is img
@@ -0,0 +1,46 @@
+import numpy as np
+import pytest
+
+from benchmark import synthetic_measurements
+from src.tiled import TiledHeatMapCreator
+from tests.helpers import make_creator, measure_all, point_set
+
+
+@pytest.mark.parametrize('connectivity', ['lattice', 'free'])
+@pytest.mark.parametrize('tile_size', [37, 64, 4096])
+def test_tiled_matches_whole_map(frame, tile_size, connectivity):
+    whole = make_creator(frame, 0.3, 0.2, ingest_mode='view', planner='lattice', connectivity=connectivity)
+    points_world = measure_all(whole)
+
+    tiled = TiledHeatMapCreator(0.3, robot_radius=0.2, tile_size=tile_size, connectivity=connectivity)
+    tiled.map_callback(*frame[:6])
+    assert point_set(tiled) == point_set(whole)
+    # 部分测量值偏离格点、为NaN或不在可用测量点上, 两种实现应同样丢弃
+    rng = np.random.default_rng(0)
+    extra = points_world[rng.integers(0, len(points_world), 20)] + rng.uniform(-0.2, 0.2, (20, 2))
+    extra_values = np.where(np.arange(20) % 5 == 0, np.nan, rng.random(20))
+    assert tiled.add_measurements(points_world, synthetic_measurements(points_world)) == len(points_world)
+    assert tiled.add_measurements(extra, extra_values) == whole.add_measurements(extra, extra_values)
+    assert np.array_equal(tiled.available_measurement_points_world, whole.available_measurement_points_world)
+
+    tiles = []
+    image = tiled.heatmap_callback(
+        np.zeros((frame.height, frame.width, 3), dtype=np.uint8),
+        on_tile=lambda y0, x0, tile_img: tiles.append((y0, x0, tile_img.copy()))
+    )
+    expected = whole.heatmap_callback()
+    assert np.array_equal(image, expected)
+    for y0, x0, tile_img in tiles:
+        assert np.array_equal(tile_img, expected[y0:y0 + tile_img.shape[0], x0:x0 + tile_img.shape[1]])
+
+
+def test_tiled_memmap_output(synthetic_frame, tmp_path):
+    whole = make_creator(synthetic_frame, 0.5, 0.16, ingest_mode='view', planner='lattice')
+    points_world = measure_all(whole)
+
+    tiled = TiledHeatMapCreator(0.5, tile_size=50)
+    tiled.map_callback(*synthetic_frame[:6])
+    tiled.add_measurements(points_world, synthetic_measurements(points_world))
+    path = str(tmp_path / 'heatmap.npy')
+    tiled.heatmap_callback(path)
+    assert np.array_equal(np.load(path), whole.heatmap_callback())